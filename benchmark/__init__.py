@@ -0,0 +1,8 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
@@ -0,0 +1,94 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+from rena import rena
+
+def append(match, synthesized, inherited):
+    inherited.append(synthesized)
+    return inherited
+
+def fresh(match, synthesized, inherited):
+    return []
+
+def arithmetic(r):
+    def term(term, factor, element):
+        return r.then(factor,
+                 r.zeroOrMore(r.choice(
+                   r.action(r.then("+", factor), lambda match, synthesized, inherit: inherit + synthesized),
+                   r.action(r.then("-", factor), lambda match, synthesized, inherit: inherit - synthesized))))
+
+    def factor(term, factor, element):
+        return r.then(element,
+                 r.zeroOrMore(r.choice(
+                   r.action(r.then("*", element), lambda match, synthesized, inherit: inherit * synthesized),
+                   r.action(r.then("/", element), lambda match, synthesized, inherit: inherit / synthesized))))
+
+    def element(term, factor, element):
+        return r.choice(r.real(), r.then("(", term, ")"))
+
+    return r.letrec(term, factor, element)
+
+def json(r):
+    string = r.action(r.re(r'"(?:[^"\\]|\\.)*"'), lambda match, synthesized, inherited: match[1:-1])
+
+    def value(value):
+        array = r.then(r.action("[", fresh),
+                  r.maybe(r.delimit(r.action(value, append), ",")),
+                  "]")
+        pair = r.then(string, ":", r.action(value, lambda match, synthesized, inherited: (inherited, synthesized)))
+        obj = r.action(r.then(r.action("{", fresh),
+                  r.maybe(r.delimit(r.action(pair, append), ",")),
+                  "}"), lambda match, synthesized, inherited: dict(synthesized))
+        return r.choice(
+            obj,
+            array,
+            string,
+            r.real(),
+            r.action("true", lambda match, synthesized, inherited: True),
+            r.action("false", lambda match, synthesized, inherited: False),
+            r.action("null", lambda match, synthesized, inherited: None))
+
+    return r.letrec(value)
+
+def jsonRena():
+    return rena.Rena({ "ignore": rena.Rena().re(r"[ \t\r\n]+") })
+
+def csv(r):
+    field = r.choice(
+        r.then('"', r.action(r.re('(?:""|[^"])*'), lambda match, synthesized, inherited: match.replace('""', '"')), '"'),
+        r.action(r.re('[^",\n\r]+'), lambda match, synthesized, inherited: match))
+    record = r.then(r.action(r.attr(None), fresh), r.delimit(r.action(field, append), ","))
+    return r.then(r.action(r.attr(None), fresh),
+             r.maybe(r.delimit(r.action(record, append), r.br())),
+             r.maybe(r.br()),
+             r.end())
+
+def keywords(r):
+    keyword = r.choice(*[r.equalsId(word) for word in ("if", "then", "else", "end", "while", "do", "print")])
+    ident = r.then(r.lookaheadNot(keyword), r.re("[a-z_][a-z0-9_]*"))
+    def expr(stmts, expr):
+        operand = r.choice(ident, r.re("[0-9]+"), r.then("(", expr, ")"))
+        return r.delimit(operand, r.choice(r.key("+"), r.key("-"), r.key("=="), r.key("<="), r.key("<")))
+
+    def stmts(stmts, expr):
+        count = lambda match, synthesized, inherited: synthesized + 1
+        stmt = r.choice(
+            r.then(r.equalsId("if"), expr, r.equalsId("then"), stmts,
+                r.maybe(r.then(r.equalsId("else"), stmts)), r.equalsId("end")),
+            r.then(r.equalsId("while"), expr, r.equalsId("do"), stmts, r.equalsId("end")),
+            r.then(r.equalsId("print"), expr, r.key(";")),
+            r.then(ident, r.key(":="), expr, r.key(";")))
+        return r.zeroOrMore(r.action(stmt, count))
+
+    return r.then(r.letrec(stmts, expr), r.end())
+
+def keywordsRena():
+    return rena.Rena({
+        "ignore": rena.Rena().re(r"[ \t\r\n]+"),
+        "keys": ["+", "-", "==", "<=", "<", ":=", ";"]
+    })
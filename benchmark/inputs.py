@@ -0,0 +1,73 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import random
+
+def _fill(size, piece, separator, seed):
+    rand = random.Random(seed)
+    pieces = []
+    length = 0
+    while length < size:
+        text = piece(rand)
+        pieces.append(text)
+        length += len(text) + len(separator)
+    return separator.join(pieces)
+
+def _term(rand):
+    return "*".join(str(rand.randint(1, 99)) for count in range(rand.randint(1, 3)))
+
+def arithmetic(size, seed=0):
+    return _fill(size, lambda rand: "(" + _term(rand) + "-" + _term(rand) + ")", "+", seed)
+
+def nestedArithmetic(depth):
+    return "(" * depth + "1+2*3" + ")" * depth
+
+def _jsonValue(rand, depth):
+    kind = rand.randint(0, 5 if depth < 3 else 3)
+    if kind == 0:
+        return str(rand.randint(-1000, 1000))
+    elif kind == 1:
+        return "%.3f" % rand.uniform(-1000, 1000)
+    elif kind == 2:
+        return '"' + "".join(rand.choice(["a", "b", "c", "d", " ", "\\\"", "\\\\"]) for count in range(rand.randint(0, 12))) + '"'
+    elif kind == 3:
+        return rand.choice(["true", "false", "null"])
+    elif kind == 4:
+        return "[" + ", ".join(_jsonValue(rand, depth + 1) for count in range(rand.randint(0, 4))) + "]"
+    return "{" + ", ".join('"k%d": %s' % (index, _jsonValue(rand, depth + 1)) for index in range(rand.randint(0, 4))) + "}"
+
+def json(size, seed=0):
+    return "[" + _fill(size, lambda rand: "\n  " + _jsonValue(rand, 0), ",", seed) + "\n]"
+
+def nestedJson(depth):
+    return "[" * depth + "1" + "]" * depth
+
+def _csvField(rand):
+    if rand.randint(0, 4) == 0:
+        return '"' + "".join(rand.choice('abc,"\n') for count in range(rand.randint(1, 10))).replace('"', '""') + '"'
+    return "".join(rand.choice("abcdefghij0123456789") for count in range(rand.randint(1, 10)))
+
+def csv(size, seed=0):
+    return _fill(size, lambda rand: ",".join(_csvField(rand) for count in range(rand.randint(1, 8))), "\n", seed) + "\n"
+
+def _statement(rand, depth):
+    kind = rand.randint(0, 3 if depth < 3 else 1)
+    ident = rand.choice(["x", "y", "count", "iffy", "done_", "total2"])
+    expr = " + ".join(rand.choice([ident, str(rand.randint(0, 99)), "(x - 1)"]) for count in range(rand.randint(1, 3)))
+    if kind == 0:
+        return ident + " := " + expr + ";"
+    elif kind == 1:
+        return "print " + expr + ";"
+    elif kind == 2:
+        body = " ".join(_statement(rand, depth + 1) for count in range(rand.randint(1, 3)))
+        return "while " + ident + " < " + expr + " do " + body + " end"
+    body = " ".join(_statement(rand, depth + 1) for count in range(rand.randint(1, 3)))
+    return "if " + ident + " == " + expr + " then " + body + " else " + _statement(rand, depth + 1) + " end"
+
+def keywords(size, seed=0):
+    return _fill(size, lambda rand: _statement(rand, 0), "\n", seed)
@@ -0,0 +1,27 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import sys
+import timeit
+from rena import rena
+from .grammars import arithmetic
+
+def nested(depth):
+    return "(" * depth + "1+2*3" + ")" * depth
+
+def main(depths=(1, 10, 100, 200), number=20):
+    sys.setrecursionlimit(100000)
+    expr = arithmetic(rena.Rena())
+    print("%8s %14s %14s" % ("depth", "usec/call", "usec/level"))
+    for depth in depths:
+        text = nested(depth)
+        seconds = timeit.timeit(lambda: expr(text, 0, 0), number=number) / number
+        print("%8d %14.1f %14.2f" % (depth, seconds * 1e6, seconds * 1e6 / depth))
+
+if __name__ == "__main__":
+    main()
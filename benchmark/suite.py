@@ -0,0 +1,156 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import argparse
+import gc
+import json
+import math
+import platform
+import sys
+import time
+import timeit
+import tracemalloc
+from rena import rena
+from . import grammars, inputs
+
+cases = {
+    "arithmetic": (rena.Rena, grammars.arithmetic, inputs.arithmetic, inputs.nestedArithmetic, 0),
+    "json": (grammars.jsonRena, grammars.json, inputs.json, inputs.nestedJson, None),
+    "csv": (rena.Rena, grammars.csv, inputs.csv, None, None),
+    "keywords": (grammars.keywordsRena, grammars.keywords, inputs.keywords, None, 0)
+}
+
+engines = {
+    "closure": lambda r, exp: exp,
+    "compile": lambda r, exp: r.compile(exp),
+    "stackless": lambda r, exp: r.stackless(exp)
+}
+
+def parseSize(text):
+    units = { "K": 1 << 10, "M": 1 << 20, "G": 1 << 30 }
+    text = text.upper().rstrip("B")
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+def measure(expr, text, attr, repeat):
+    try:
+        result = expr(text, 0, attr)
+    except RecursionError:
+        return { "error": "RecursionError" }
+    if result[1] != len(text):
+        return { "error": "matched " + str(result[1]) + " of " + str(len(text)) }
+    seconds = min(timeit.repeat(lambda: expr(text, 0, attr), number=1, repeat=repeat))
+    gc.collect()
+    collections = sum(stat["collections"] for stat in gc.get_stats())
+    blocks = sys.getallocatedblocks()
+    tracemalloc.start()
+    result = expr(text, 0, attr)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    retained = sys.getallocatedblocks() - blocks
+    del result
+    gc.collect()
+    gc.disable()
+    try:
+        count = gc.get_count()[0]
+        result = expr(text, 0, attr)
+        allocations = gc.get_count()[0] - count
+    finally:
+        gc.enable()
+    del result
+    return {
+        "seconds": seconds,
+        "mbPerSecond": len(text) / seconds / (1 << 20),
+        "peakMemory": peak,
+        "retainedBlocks": retained,
+        "allocations": allocations,
+        "gcCollections": sum(stat["collections"] for stat in gc.get_stats()) - collections
+    }
+
+def measureEdit(r, exp, text, attr, repeat):
+    parser = r.incremental(exp)
+    parser.parse(text, attr)
+    offset = len(text) // 2
+    seconds = min(timeit.repeat(lambda: parser.edit(offset, 1, text[offset]), number=1, repeat=repeat))
+    return { "editSeconds": seconds }
+
+def editScaling(results):
+    scaling = {}
+    for name in sorted(set(result["grammar"] for result in results)):
+        edits = sorted((result["bytes"], result["editSeconds"]) for result in results
+            if result["grammar"] == name and "editSeconds" in result)
+        if len(edits) > 1 and edits[-1][0] > edits[0][0]:
+            scaling[name] = math.log(edits[-1][1] / edits[0][1]) / math.log(edits[-1][0] / edits[0][0])
+    return scaling
+
+def run(names, engineNames, sizes, depths, repeat, report=print, edits=False):
+    results = []
+    for name in names:
+        makeRena, grammar, generate, nest, attr = cases[name]
+        texts = [("size", size, generate(size)) for size in sizes]
+        if nest is not None:
+            texts.extend(("depth", depth, nest(depth)) for depth in depths)
+        for engine in engineNames:
+            r = makeRena()
+            expr = engines[engine](r, grammar(r))
+            for kind, value, text in texts:
+                result = { "grammar": name, "engine": engine, kind: value, "bytes": len(text) }
+                result.update(measure(expr, text, attr, repeat))
+                report(result)
+                results.append(result)
+        if edits:
+            r = makeRena()
+            exp = grammar(r)
+            for size, text in [(value, text) for kind, value, text in texts if kind == "size"]:
+                result = { "grammar": name, "engine": "incremental", "size": size, "bytes": len(text) }
+                result.update(measureEdit(r, exp, text, attr, repeat))
+                report(result)
+                results.append(result)
+    return results
+
+def formatResult(result):
+    scale = "size=" + str(result["size"]) if "size" in result else "depth=" + str(result["depth"])
+    head = "%-10s %-9s %-14s" % (result["grammar"], result["engine"], scale)
+    if "error" in result:
+        return head + " " + result["error"]
+    elif "editSeconds" in result:
+        return head + " %10.3f ms/edit" % (result["editSeconds"] * 1000)
+    return head + " %10.3f MB/s %12d peak %10d blocks %10d allocs %6d gc" % (
+        result["mbPerSecond"], result["peakMemory"], result["retainedBlocks"], result["allocations"],
+        result["gcCollections"])
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="benchmark of reference grammars")
+    parser.add_argument("--grammars", nargs="+", default=sorted(cases), choices=sorted(cases))
+    parser.add_argument("--engines", nargs="+", default=["closure", "compile"], choices=sorted(engines))
+    parser.add_argument("--sizes", nargs="+", default=["1K", "10K", "100K", "1M"])
+    parser.add_argument("--depths", nargs="+", type=int, default=[1, 10, 100, 1000, 10000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--edits", action="store_true", help="measure one-character edits of incremental parses")
+    parser.add_argument("--recursion-limit", type=int, default=20000)
+    parser.add_argument("--output", help="JSON file to save results")
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.recursion_limit))
+    results = run(args.grammars, args.engines, [parseSize(size) for size in args.sizes], args.depths, args.repeat,
+        lambda result: print(formatResult(result), flush=True), args.edits)
+    scaling = editScaling(results)
+    for name, exponent in sorted(scaling.items()):
+        print("%-10s edit time grows as size^%.2f" % (name, exponent))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                "python": platform.python_version(),
+                "implementation": platform.python_implementation(),
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "results": results,
+                "editScaling": scaling
+            }, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import builtins
+import hashlib
+import importlib
+import io
+import marshal
+import os
+import pickle
+import sys
+import types
+from .compiler import Compiler
+
+_format = b"rena-cache-1"
+_sourceDigest = None
+_stdlib = getattr(sys, "stdlib_module_names", frozenset()) | frozenset(("rena",))
+
+class _EmptyCell:
+    pass
+
+def _importable(function):
+    module = sys.modules.get(function.__module__)
+    value = module
+    for name in function.__qualname__.split("."):
+        value = getattr(value, name, None)
+    return value is function
+
+def _function(code, module, name, cells):
+    if module is None:
+        namespace = { "__builtins__": builtins }
+    else:
+        namespace = (sys.modules.get(module) or importlib.import_module(module)).__dict__
+    return types.FunctionType(code, namespace, name, None, tuple(types.CellType() for cell in range(cells)))
+
+def _setFunction(function, state):
+    qualname, defaults, kwdefaults, contents, attributes = state
+    function.__qualname__ = qualname
+    function.__defaults__ = defaults
+    function.__kwdefaults__ = kwdefaults
+    function.__dict__.update(attributes)
+    for cell, value in zip(function.__closure__ or (), contents):
+        if value is not _EmptyCell:
+            cell.cell_contents = value
+
+def _cellContents(cell):
+    try:
+        return cell.cell_contents
+    except ValueError:
+        return _EmptyCell
+
+class _Pickler(pickle.Pickler):
+    def reducer_override(self, obj):
+        if type(obj) is types.CodeType:
+            return (marshal.loads, (marshal.dumps(obj),))
+        elif type(obj) is types.FunctionType and not _importable(obj):
+            closure = obj.__closure__ or ()
+            return (_function, (obj.__code__, obj.__module__, obj.__name__, len(closure)),
+                (obj.__qualname__, obj.__defaults__, obj.__kwdefaults__,
+                    [_cellContents(cell) for cell in closure], obj.__dict__),
+                None, None, _setFunction)
+        return NotImplemented
+
+def _digest():
+    global _sourceDigest
+    if _sourceDigest is None:
+        digest = hashlib.sha256()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for name in sorted(os.listdir(directory)):
+            if name.endswith(".py"):
+                with open(os.path.join(directory, name), "rb") as f:
+                    digest.update(f.read())
+        _sourceDigest = digest.digest()
+    return _sourceDigest
+
+def _codeDigest(digest, code):
+    digest.update(code.co_code)
+    digest.update(repr((code.co_name, code.co_names, code.co_varnames, code.co_freevars, code.co_cellvars,
+        code.co_argcount, code.co_kwonlyargcount, code.co_flags)).encode())
+    for const in code.co_consts:
+        if type(const) is types.CodeType:
+            _codeDigest(digest, const)
+        elif type(const) is frozenset:
+            digest.update(repr(sorted(const, key=repr)).encode())
+        else:
+            digest.update(repr(const).encode())
+
+def _names(code):
+    names = set(code.co_names)
+    for const in code.co_consts:
+        if type(const) is types.CodeType:
+            names.update(_names(const))
+    return names
+
+def _moduleDigest(digest, module, seen):
+    name = getattr(module, "__name__", None)
+    path = getattr(module, "__file__", None)
+    if name is None or path is None or not path.endswith(".py") or name.split(".")[0] in _stdlib or path in seen:
+        return
+    seen.add(path)
+    with open(path, "rb") as f:
+        digest.update(f.read())
+
+def _valueDigest(digest, value, seen):
+    kind = type(value)
+    digest.update(kind.__name__.encode())
+    if value is None or kind in (bool, int, float, complex, str, bytes):
+        digest.update(repr(value).encode())
+        return
+    elif id(value) in seen:
+        return
+    seen.add(id(value))
+    if kind is types.FunctionType:
+        _codeDigest(digest, value.__code__)
+        _valueDigest(digest, value.__defaults__, seen)
+        _moduleDigest(digest, sys.modules.get(value.__module__), seen)
+        for name in sorted(_names(value.__code__)):
+            if name in value.__globals__:
+                digest.update(name.encode())
+                _valueDigest(digest, value.__globals__[name], seen)
+        for cell in value.__closure__ or ():
+            _valueDigest(digest, _cellContents(cell), seen)
+    elif kind is types.ModuleType:
+        _moduleDigest(digest, value, seen)
+    elif kind is type:
+        _moduleDigest(digest, sys.modules.get(value.__module__), seen)
+        digest.update(value.__qualname__.encode())
+    elif kind in (tuple, list):
+        for item in value:
+            _valueDigest(digest, item, seen)
+    elif kind is dict:
+        for item in value.items():
+            _valueDigest(digest, item, seen)
+    elif kind in (set, frozenset):
+        digest.update(repr(sorted(value, key=repr)).encode())
+
+def _fingerprint(factory, key=None, stackless=False):
+    digest = hashlib.sha256(_format)
+    digest.update(sys.implementation.cache_tag.encode())
+    digest.update(_digest())
+    _valueDigest(digest, factory, set())
+    digest.update(repr((factory.__module__, factory.__qualname__, key, stackless)).encode())
+    return digest.hexdigest()
+
+def _dumps(program):
+    data = io.BytesIO()
+    data.write(_format + b"\n")
+    _Pickler(data, pickle.HIGHEST_PROTOCOL).dump(program)
+    return data.getvalue()
+
+def _save(rena, exp, path, stackless):
+    program = Compiler(rena, stackless).program(rena.optimize(exp))
+    temp = path + "." + str(os.getpid()) + ".tmp"
+    with open(temp, "wb") as f:
+        f.write(_dumps(program))
+    os.replace(temp, path)
+    return program.link()
+
+def _load(path):
+    with open(path, "rb") as f:
+        if f.readline() != _format + b"\n":
+            raise ValueError("not a rena cache: " + path)
+        return pickle.load(f).link()
+
+def _cached(factory, directory, key, stackless):
+    path = os.path.join(directory, _fingerprint(factory, key, stackless) + ".rena")
+    try:
+        return _load(path)
+    except FileNotFoundError:
+        pass
+    rena, exp = factory()
+    os.makedirs(directory, exist_ok=True)
+    return _save(rena, exp, path, stackless)
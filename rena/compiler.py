@@ -0,0 +1,354 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+from .rena import _synthesized, _first, _text, Literal, Regex, Real, Seq, Choice, Repeat, Delimit, Lookahead, \
+    Attr, Cond, Action, Key, NotKey, EqualsId, End, Memo, Profile, Rule, Cut, Commit, Collector, ParseError
+from .machine import Machine
+
+_codeCache = {}
+_maxDepth = 24
+_maxLoops = 12
+
+class Program:
+    def __init__(self, code, constants, memos, entry, stackless):
+        self.code = code
+        self.constants = constants
+        self.memos = memos
+        self.entry = entry
+        self.stackless = stackless
+
+    def link(self):
+        namespace = dict(self.constants)
+        namespace["FAIL"] = (None, None, None)
+        exec(self.code, namespace)
+        for name, table, memoId, counter, inner in self.memos:
+            namespace[name] = Memo(table, memoId, counter, namespace[inner])
+        if self.stackless:
+            return Machine(namespace[self.entry])
+        return namespace[self.entry]
+
+class Compiler:
+    def __init__(self, rena, stackless=False):
+        self.rena = rena
+        self.stackless = stackless
+        self.namespace = { "FAIL": (None, None, None) }
+        self.constants = {}
+        self.functions = {}
+        self.pending = []
+        self.memos = []
+        self.lines = []
+        self.temps = 0
+        self.methods = {}
+
+    def compile(self, exp):
+        return self.program(exp).link()
+
+    def program(self, exp):
+        entry = self.function(exp)
+        while self.pending:
+            name, exp = self.pending.pop(0)
+            self.generate(name, exp)
+        source = "\n".join(self.lines) + "\n"
+        if source not in _codeCache:
+            _codeCache[source] = compile(source, "<rena>", "exec")
+        constants = dict((name, value) for name, value in self.namespace.items() if name != "FAIL")
+        memos = [(name, memo.table, memo.memoId, memo.counter, inner) for name, memo, inner in self.memos]
+        return Program(_codeCache[source], constants, memos, entry, self.stackless)
+
+    def constant(self, value):
+        if id(value) not in self.constants:
+            name = "c" + str(len(self.constants))
+            self.constants[id(value)] = (name, value)
+            self.namespace[name] = value
+        return self.constants[id(value)][0]
+
+    def function(self, exp):
+        if id(exp) not in self.functions:
+            name = "f" + str(len(self.functions))
+            self.functions[id(exp)] = (name, exp)
+            self.pending.append((name, exp))
+        return self.functions[id(exp)][0]
+
+    def temp(self):
+        self.temps += 1
+        return "t" + str(self.temps)
+
+    def line(self, depth, text):
+        self.lines.append("    " * depth + text)
+
+    def generate(self, name, exp):
+        self.line(0, "def " + name + "(match, lastIndex, attr):")
+        self.line(1, "i = lastIndex")
+        self.line(1, "a = attr")
+        self.emit(exp, "return FAIL", "i", "a", 1, 0, True)
+        self.line(1, "return (m, i, a)")
+
+    def method(self, rena, name):
+        if (id(rena), name) not in self.methods:
+            self.methods[(id(rena), name)] = self.constant(getattr(rena, name))
+        return self.methods[(id(rena), name)]
+
+    def ignore(self, rena, depth, i):
+        if rena._ignorePattern is not None:
+            skipped = self.temp()
+            self.line(depth, skipped + " = " + self.constant(rena._ignorePattern) + ".match(match, " + i + ")")
+            self.line(depth, "if " + skipped + " is not None: " + i + " = " + skipped + ".end()")
+        elif rena._ignoreExp is not None:
+            self.line(depth, i + " = " + self.method(rena, "_ignore") + "(match, " + i + ")")
+
+    def call(self, name, fail, i, a, depth):
+        self.line(depth, "m, " + i + ", " + a + " = " + name + "(match, " + i + ", " + a + ")")
+        self.line(depth, "if m is None: " + fail)
+
+    def callFunction(self, name, fail, i, a, depth):
+        if self.stackless:
+            self.line(depth, "m, " + i + ", " + a + " = yield (" + name + ", " + i + ", " + a + ")")
+            self.line(depth, "if m is None: " + fail)
+        else:
+            self.call(name, fail, i, a, depth)
+
+    def matched(self, exp, depth, start, end, text):
+        if exp.rena._spans:
+            self.line(depth, "m = (" + start + ", " + end + ")")
+        else:
+            self.line(depth, "m = " + text)
+
+    def text(self, exp):
+        return self.constant(_text) + "(match, m)" if exp.rena._spans else "m"
+
+    def emit(self, exp, fail, i, a, depth, loops, top=False):
+        kind = type(exp)
+        if kind is Rule:
+            self.callFunction(self.function(exp.exp), fail, i, a, depth)
+        elif kind is Profile:
+            self.emitProfile(exp, fail, i, a, depth)
+        elif kind is Memo and self.stackless:
+            self.emitMemo(exp, fail, i, a, depth)
+        elif kind is Memo:
+            name = "memo" + str(len(self.memos))
+            self.memos.append((name, exp, self.function(exp.exp)))
+            self.call(name, fail, i, a, depth)
+        elif kind is Literal:
+            if exp.rena._bytes:
+                self.line(depth, "if match[" + i + ":" + i + " + " + str(len(exp.string)) + "] != " + repr(exp.string) + ": " + fail)
+            else:
+                self.line(depth, "if not match.startswith(" + repr(exp.string) + ", " + i + "): " + fail)
+            self.matched(exp, depth, i, i + " + " + str(len(exp.string)), repr(exp.string))
+            self.line(depth, i + " += " + str(len(exp.string)))
+        elif kind is Regex or kind is Real:
+            result = self.temp()
+            self.line(depth, result + " = " + self.constant(exp.pattern) + ".match(match, " + i + ")")
+            self.line(depth, "if " + result + " is None: " + fail)
+            self.matched(exp, depth, i, result + ".end()", result + ".group(0)")
+            self.line(depth, i + " = " + result + ".end()")
+            if kind is Real:
+                self.line(depth, a + " = float(" + ("bytes(" + result + ".group(0))" if exp.rena._bytes else result + ".group(0)") + ")")
+        elif kind is Attr:
+            self.matched(exp, depth, i, i, "match")
+            self.line(depth, a + " = " + self.constant(exp.value))
+        elif kind is Cond:
+            self.line(depth, "if not " + self.constant(exp.predicate) + "(" + a + "): " + fail)
+            self.matched(exp, depth, i, i, "\"\"")
+        elif kind is End:
+            self.line(depth, "if " + i + " != len(match): " + fail)
+            self.matched(exp, depth, i, i, "\"\"")
+        elif kind is Key:
+            findKey = self.method(exp.rena, "_findKey")
+            self.line(depth, "if " + findKey + "(match, " + i + ") != " + repr(exp.key) + ": " + fail)
+            self.matched(exp, depth, i, i + " + " + str(len(exp.key)), repr(exp.key))
+            self.line(depth, i + " += " + str(len(exp.key)))
+        elif kind is NotKey:
+            self.line(depth, "if " + self.method(exp.rena, "_findKey") + "(match, " + i + "): " + fail)
+            self.matched(exp, depth, i, i, "\"\"")
+        elif kind is Cut:
+            self.discard(exp, depth, i)
+            self.matched(exp, depth, i, i, "\"\"")
+        elif kind is Commit:
+            start = self.temp()
+            self.discard(exp, depth, i)
+            self.line(depth, start + " = " + i)
+            for index, child in enumerate(exp.exps):
+                if index > 0:
+                    self.ignore(exp.rena, depth, i)
+                self.emit(child, "raise " + self.constant(ParseError) + "(\"committed expression does not match\", " + start + ")",
+                    i, a, depth, loops)
+            if len(exp.exps) > 1:
+                self.matched(exp, depth, start, i, "match[" + start + ":" + i + "]")
+        elif kind not in (EqualsId, Seq, Choice, Repeat, Delimit, Lookahead, Action):
+            self.call(self.constant(exp), fail, i, a, depth)
+        elif not top and (depth > _maxDepth or loops > _maxLoops):
+            self.callFunction(self.function(exp), fail, i, a, depth)
+        elif kind is EqualsId:
+            self.emitEqualsId(exp, fail, i, a, depth, loops)
+        elif kind is Seq:
+            start = self.temp()
+            self.line(depth, start + " = " + i)
+            for child in exp.exps:
+                self.emit(child, fail, i, a, depth, loops)
+                self.ignore(exp.rena, depth, i)
+            self.matched(exp, depth, start, i, "match[" + start + ":" + i + "]")
+        elif kind is Choice:
+            self.emitChoice(exp, fail, i, a, depth, loops)
+        elif kind is Repeat:
+            self.emitRepeat(exp, fail, i, a, depth, loops)
+        elif kind is Delimit:
+            self.emitDelimit(exp, fail, i, a, depth, loops)
+        elif kind is Lookahead:
+            savedIndex, savedAttr, matched = self.temp(), self.temp(), self.temp()
+            self.line(depth, savedIndex + " = " + i)
+            self.line(depth, savedAttr + " = " + a)
+            self.line(depth, matched + " = False")
+            self.line(depth, "while True:")
+            self.emit(exp.exp, "break", i, a, depth + 1, loops + 1)
+            self.line(depth + 1, matched + " = True")
+            self.line(depth + 1, "break")
+            self.line(depth, i + " = " + savedIndex)
+            self.line(depth, a + " = " + savedAttr)
+            self.line(depth, "if " + ("not " if exp.signum else "") + matched + ": " + fail)
+            self.matched(exp, depth, i, i, "\"\"")
+        else:
+            inherited = self.temp()
+            self.line(depth, inherited + " = " + a)
+            self.emit(exp.exp, fail, i, a, depth, loops)
+            self.line(depth, a + " = " + self.constant(exp.action) + "(" + self.text(exp) + ", " + a + ", " + inherited + ")")
+
+    def discard(self, exp, depth, i):
+        if exp.rena._memoTable is not None:
+            self.line(depth, self.constant(exp.rena._memoTable) + ".discard(match, " + i + ")")
+
+    def emitProfile(self, exp, fail, i, a, depth):
+        profile, start, inner = self.constant(exp), self.temp(), self.function(exp.exp)
+        self.line(depth, start + " = " + profile + ".enter(match, " + i + ")")
+        self.line(depth, "m = None")
+        self.line(depth, "try:")
+        if self.stackless:
+            self.line(depth + 1, "m, " + i + ", " + a + " = yield (" + inner + ", " + i + ", " + a + ")")
+        else:
+            self.line(depth + 1, "m, " + i + ", " + a + " = " + inner + "(match, " + i + ", " + a + ")")
+        self.line(depth, "finally:")
+        self.line(depth + 1, profile + ".leave(" + start + ", m)")
+        self.line(depth, "if m is None: " + fail)
+
+    def emitMemo(self, exp, fail, i, a, depth):
+        table, key, result = self.constant(exp.table), self.temp(), self.temp()
+        self.line(depth, key + " = (" + repr(exp.memoId) + ", " + i + ", id(" + a + "))")
+        self.line(depth, result + " = " + table + ".lookup(match, " + key + ", " + a + ")")
+        self.line(depth, "if " + result + " is None:")
+        self.line(depth + 1, self.constant(exp.counter) + "[\"misses\"] += 1")
+        self.line(depth + 1, table + ".depth += 1")
+        self.line(depth + 1, "try:")
+        self.line(depth + 2, result + " = yield (" + self.function(exp.exp) + ", " + i + ", " + a + ")")
+        self.line(depth + 1, "finally:")
+        self.line(depth + 2, table + ".depth -= 1")
+        self.line(depth + 1, table + ".store(" + key + ", " + a + ", " + result + ")")
+        self.line(depth, "else:")
+        self.line(depth + 1, self.constant(exp.counter) + "[\"hits\"] += 1")
+        self.line(depth, "m, " + i + ", " + a + " = " + result)
+        self.line(depth, "if m is None: " + fail)
+
+    def emitEqualsId(self, exp, fail, i, a, depth, loops):
+        self.emit(exp.exp, fail, i, a, depth, loops)
+        rena = exp.rena
+        findKey = self.method(rena, "_findKey")
+        if rena._ignoreExp is not None:
+            skipped = self.temp()
+            self.line(depth, "if " + i + " != len(match):")
+            self.line(depth + 1, skipped + " = " + self.method(rena, "_ignore") + "(match, " + i + ")")
+            self.line(depth + 1, "if " + skipped + " != " + i + ":")
+            self.line(depth + 2, i + " = " + skipped)
+            if rena._keyPattern is not None:
+                self.line(depth + 1, "elif " + findKey + "(match, " + i + "):")
+                self.line(depth + 2, "pass")
+            self.line(depth + 1, "else:")
+            self.line(depth + 2, fail)
+        elif rena._keyPattern is not None:
+            self.line(depth, "if " + i + " != len(match) and not " + findKey + "(match, " + i + "): " + fail)
+
+    def emitChoice(self, exp, fail, i, a, depth, loops):
+        savedIndex, savedAttr, matched = self.temp(), self.temp(), self.temp()
+        self.line(depth, savedIndex + " = " + i)
+        self.line(depth, savedAttr + " = " + a)
+        self.line(depth, matched + " = False")
+        for index, child in enumerate(exp.exps):
+            inner = depth
+            if index > 0:
+                self.line(depth, "if not " + matched + ":")
+                inner = depth + 1
+                self.line(inner, i + " = " + savedIndex)
+                self.line(inner, a + " = " + savedAttr)
+            self.line(inner, "while True:")
+            first = _first(child)
+            if first is not None:
+                self.line(inner + 1, "if " + i + " >= len(match) or match[" + i + "] not in " + self.constant(first) + ": break")
+            self.emit(child, "break", i, a, inner + 1, loops + 1)
+            self.line(inner + 1, matched + " = True")
+            self.line(inner + 1, "break")
+        self.line(depth, "if not " + matched + ": " + fail)
+
+    def emitRepeat(self, exp, fail, i, a, depth, loops):
+        mincount, maxcount, action = exp.mincount, exp.maxcount, exp.action
+        start, count, savedIndex, savedAttr = self.temp(), self.temp(), self.temp(), self.temp()
+        self.line(depth, start + " = " + i)
+        self.line(depth, count + " = 0")
+        values = self.values(action, depth)
+        self.line(depth, "while " + ("True" if maxcount is None else count + " < " + str(maxcount)) + ":")
+        self.line(depth + 1, savedIndex + " = " + i)
+        self.line(depth + 1, savedAttr + " = " + a)
+        self.emit(exp.exp, i + " = " + savedIndex + "; " + a + " = " + savedAttr + "; break", i, a, depth + 1, loops + 1)
+        self.ignore(exp.rena, depth + 1, i)
+        if type(action) is Collector:
+            self.append(exp, action, values, a, depth + 1)
+        elif action is not _synthesized:
+            self.line(depth + 1, a + " = " + self.constant(action) + "(" + self.text(exp) + ", " + a + ", " + savedAttr + ")")
+        self.line(depth + 1, count + " += 1")
+        if mincount > 0:
+            self.line(depth, "if " + count + " < " + str(mincount) + ": " + fail)
+        self.finish(action, values, count, a, depth)
+        self.matched(exp, depth, start, i, "match[" + start + ":" + i + "]")
+
+    def emitDelimit(self, exp, fail, i, a, depth, loops):
+        action = exp.action
+        start, indexLoop, attrLoop, matched = self.temp(), self.temp(), self.temp(), self.temp()
+        self.line(depth, start + " = " + i)
+        self.line(depth, indexLoop + " = " + i)
+        self.line(depth, attrLoop + " = " + a)
+        self.line(depth, matched + " = 0")
+        values = self.values(action, depth)
+        self.line(depth, "while True:")
+        self.emit(exp.exp, "break", indexLoop, attrLoop, depth + 1, loops + 1)
+        self.line(depth + 1, matched + " += 1")
+        self.line(depth + 1, i + " = " + indexLoop)
+        if type(action) is Collector:
+            self.append(exp, action, values, attrLoop, depth + 1)
+        elif action is _synthesized:
+            self.line(depth + 1, a + " = " + attrLoop)
+        else:
+            self.line(depth + 1, a + " = " + self.constant(action) + "(" + self.text(exp) + ", " + attrLoop + ", " + a + ")")
+        self.ignore(exp.rena, depth + 1, indexLoop)
+        self.emit(exp.delimiter, "break", indexLoop, attrLoop, depth + 1, loops + 1)
+        self.ignore(exp.rena, depth + 1, indexLoop)
+        self.line(depth, "if not " + matched + ": " + fail)
+        self.finish(action, values, matched, a, depth)
+        self.ignore(exp.rena, depth, i)
+        self.matched(exp, depth, start, i, "match[" + start + ":" + i + "]")
+
+    def values(self, action, depth):
+        if type(action) is not Collector or action.kind == "count":
+            return None
+        values = self.temp()
+        self.line(depth, values + " = []")
+        self.line(depth, values + "Append = " + values + ".append")
+        return values
+
+    def append(self, exp, action, values, a, depth):
+        if values is not None:
+            self.line(depth, values + "Append(" + (self.text(exp) if action.kind == "join" else a) + ")")
+
+    def finish(self, action, values, count, a, depth):
+        if type(action) is Collector:
+            self.line(depth, a + " = " + self.constant(action) + ".finish(" + str(values) + ", " + count + ")")
@@ -0,0 +1,180 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import bisect
+import heapq
+from .rena import Node
+from .stream import _Tracker
+
+_span = 256
+
+def _memoKey(memoId, lastIndex, attr):
+    try:
+        hash(attr)
+    except TypeError:
+        return (memoId, lastIndex, None, id(attr))
+    return (memoId, lastIndex, type(attr), attr)
+
+def _shift(result, delta):
+    matched, indexNew, attrNew = result
+    if matched is None or delta == 0:
+        return result
+    elif type(matched) is tuple:
+        matched = (matched[0] + delta, matched[1] + delta)
+    return (matched, indexNew + delta, attrNew)
+
+class _Segment:
+    def __init__(self, start):
+        self.start = start
+        self.entries = {}
+        self.reaches = []
+        self.lows = []
+
+    def add(self, key, entry, sequence):
+        self.entries[key] = entry
+        heapq.heappush(self.reaches, (-entry[2], sequence, key, entry))
+        heapq.heappush(self.lows, (entry[3], sequence, key, entry))
+
+    def pop(self, heap, limit):
+        removed = []
+        while heap and -heap[0][0] > limit:
+            item = heapq.heappop(heap)
+            if self.entries.get(item[2]) is item[3]:
+                del self.entries[item[2]]
+                removed.append(item[2:])
+        return removed
+
+class _Entries:
+    def __init__(self):
+        self.starts = [0]
+        self.segments = [_Segment(0)]
+        self.sequence = 0
+
+    def get(self, key):
+        segment = self.segments[bisect.bisect_right(self.starts, key[1]) - 1]
+        start = segment.start
+        entry = segment.entries.get((key[0], key[1] - start) + key[2:])
+        if entry is None or start == 0:
+            return entry
+        return (entry[0], _shift(entry[1], start), entry[2] + start, entry[3] + start)
+
+    def store(self, key, entry):
+        index = bisect.bisect_right(self.starts, key[1]) - 1
+        segment = self.segments[index]
+        if key[1] - segment.start >= _span:
+            segment = _Segment(key[1])
+            index += 1
+            self.starts.insert(index, key[1])
+            self.segments.insert(index, segment)
+        start = segment.start
+        self.sequence += 1
+        segment.add((key[0], key[1] - start) + key[2:],
+            (entry[0], _shift(entry[1], -start), entry[2] - start, entry[3] - start), self.sequence)
+
+    def edit(self, offset, end, delta):
+        if offset == end and delta == 0:
+            return
+        starts, segments = self.starts, self.segments
+        first = bisect.bisect_right(starts, offset) - 1
+        last = bisect.bisect_right(starts, end) - 1
+        for segment in segments[:first]:
+            if segment.reaches and -segment.reaches[0][0] > offset - segment.start:
+                segment.pop(segment.reaches, offset - segment.start)
+        moved = []
+        segment = segments[first]
+        for key, entry in segment.pop(segment.reaches, offset - segment.start):
+            if entry[3] + segment.start >= end:
+                moved.append((segment.start, key, entry))
+        if last > first:
+            segment = segments[last]
+            segment.pop(segment.lows, segment.start - end)
+            if segment.start == end:
+                last -= 1
+            else:
+                moved.extend((segment.start, key, entry) for key, entry in segment.entries.items())
+        right = _Segment(end + delta)
+        for start, key, entry in moved:
+            self.sequence += 1
+            right.add((key[0], key[1] + start - end) + key[2:],
+                (entry[0], _shift(entry[1], start - end), entry[2] + start - end, entry[3] + start - end),
+                self.sequence)
+        for segment in segments[last + 1:]:
+            if segment.lows and segment.lows[0][0] < end - segment.start:
+                segment.pop(segment.lows, segment.start - end)
+            segment.start += delta
+        segments[first + 1:last + 1] = [right] if right.entries else []
+        starts[:] = [segment.start for segment in segments]
+
+class _IncrementalMemo(Node):
+    __slots__ = ("incremental", "memoId", "exp")
+
+    def __init__(self, incremental, memoId, exp):
+        self.incremental = incremental
+        self.memoId = memoId
+        self.exp = exp
+
+    def __call__(self, match, lastIndex, attr):
+        incremental = self.incremental
+        tracker = incremental.tracker
+        key = _memoKey(self.memoId, lastIndex, attr)
+        entry = incremental.entries.get(key)
+        if entry is not None and (key[2] is not None or entry[0] is attr):
+            incremental.counter["hits"] += 1
+            tracker.touch(entry[2])
+            tracker.back(entry[3])
+            return entry[1]
+        incremental.counter["misses"] += 1
+        reach, low = tracker.reach, tracker.low
+        tracker.reach, tracker.low = 0, lastIndex
+        result = self.exp(match, lastIndex, attr)
+        entry = (attr, result, max(tracker.reach, lastIndex), tracker.low)
+        incremental.entries.store(key, entry)
+        tracker.reach, tracker.low = max(reach, entry[2]), min(low, entry[3])
+        return result
+
+class _IncrementalTracker(_Tracker):
+    def __init__(self, incremental):
+        _Tracker.__init__(self)
+        self.incremental = incremental
+
+    def wrap(self, exp):
+        self.incremental.memos += 1
+        return _IncrementalMemo(self.incremental, self.incremental.memos, exp)
+
+    def rule(self, rule, exp):
+        return exp if type(exp) is _IncrementalMemo else self.wrap(exp)
+
+    def memo(self, memo, exp):
+        return self.wrap(exp)
+
+class Incremental:
+    def __init__(self, rena, exp):
+        self.memos = 0
+        self.entries = _Entries()
+        self.counter = { "hits": 0, "misses": 0 }
+        self.tracker = _IncrementalTracker(self)
+        self.exp = self.tracker.track(rena.wrap(exp))
+        self.text = None
+        self.attr = None
+        self.result = None
+
+    def parse(self, text, attr=None):
+        self.entries = _Entries()
+        self.text = text
+        self.attr = attr
+        return self.reparse()
+
+    def reparse(self):
+        self.tracker.reach = 0
+        self.result = self.exp(self.text, 0, self.attr)
+        return self.result
+
+    def edit(self, offset, deleted, inserted):
+        self.entries.edit(offset, offset + deleted, len(inserted) - deleted)
+        self.text = self.text[:offset] + inserted + self.text[offset + deleted:]
+        return self.reparse()
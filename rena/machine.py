@@ -0,0 +1,37 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+
+class Machine:
+    __slots__ = ("entry",)
+
+    def __init__(self, entry):
+        self.entry = entry
+
+    def __call__(self, match, lastIndex, attr):
+        frame = self.entry(match, lastIndex, attr)
+        if type(frame) is tuple:
+            return frame
+        stack = []
+        result = None
+        while True:
+            try:
+                function, index, attrNew = frame.send(result)
+            except StopIteration as stop:
+                if not stack:
+                    return stop.value
+                frame = stack.pop()
+                result = stop.value
+                continue
+            child = function(match, index, attrNew)
+            if type(child) is tuple:
+                result = child
+            else:
+                stack.append(frame)
+                frame = child
+                result = None
@@ -0,0 +1,157 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+import re
+from .rena import _synthesized, _fields, Node, Literal, Regex, Seq, Choice, Repeat, Delimit, Lookahead, End, Rule
+
+try:
+    re.compile("(?>a)")
+    _atomicGroup = True
+except re.error:
+    _atomicGroup = False
+
+class Optimizer:
+    def __init__(self, rena):
+        self.rena = rena
+        self.fuse = _atomicGroup and rena._fuse
+        self.fused = {}
+        self.done = {}
+
+    def optimize(self, exp):
+        if id(exp) in self.done:
+            return self.done[id(exp)][1]
+        if not isinstance(exp, Node):
+            return exp
+        if type(exp) is Rule:
+            result = Rule(exp.name)
+            self.done[id(exp)] = (exp, result)
+            result.exp = self.optimize(exp.exp)
+            return result
+        result = self.rebuild(exp)
+        if type(result) is Seq:
+            result = self.optimizeSeq(result)
+        elif type(result) is Choice:
+            result = self.optimizeChoice(result)
+        if self.fuse and type(result) in (Seq, Choice, Repeat, Delimit, Lookahead):
+            pattern = self.pattern(result)
+            if pattern is not None:
+                result = self.regex(getattr(result, "rena", self.rena), pattern)
+        self.done[id(exp)] = (exp, result)
+        return result
+
+    def rebuild(self, exp):
+        result = object.__new__(type(exp))
+        for name in _fields(type(exp)):
+            value = getattr(exp, name)
+            if name == "exp" or name == "delimiter":
+                value = self.optimize(value)
+            elif name == "exps":
+                value = tuple(self.optimize(child) for child in value)
+            setattr(result, name, value)
+        return result
+
+    def optimizeSeq(self, exp):
+        exps = exp.exps
+        if exp.rena._ignoreExp is None:
+            flattened = []
+            for child in exps:
+                if type(child) is Seq and child.rena._ignoreExp is None:
+                    flattened.extend(child.exps)
+                else:
+                    flattened.append(child)
+            merged = []
+            for child in flattened:
+                if type(child) is Literal and merged and type(merged[-1]) is Literal:
+                    merged[-1] = Literal(child.rena, merged[-1].string + child.string)
+                else:
+                    merged.append(child)
+            exps = tuple(merged)
+        ignore = self.ignorePattern(exp.rena)
+        if ignore is not None:
+            exps = self.fuseRuns(exps, lambda patterns: "(?>" + ignore.join(patterns) + ")")
+        return Seq(exp.rena, exps)
+
+    def fuseRuns(self, exps, join):
+        if not self.fuse:
+            return exps
+        result = []
+        run = []
+        for exp in exps + (None,):
+            pattern = None if exp is None else self.pattern(exp)
+            if pattern is not None:
+                run.append((exp, pattern))
+                continue
+            if len(run) > 1:
+                result.append(self.regex(getattr(run[0][0], "rena", self.rena), join([pattern for child, pattern in run])))
+            else:
+                result.extend(child for child, pattern in run)
+            run = []
+            if exp is not None:
+                result.append(exp)
+        return tuple(result)
+
+    def regex(self, rena, pattern):
+        result = Regex(rena, re.compile(pattern.encode("latin-1") if rena._bytes else pattern))
+        self.fused[id(result)] = (result, pattern)
+        return result
+
+    def ignorePattern(self, rena):
+        if rena._ignoreExp is None:
+            return ""
+        pattern = self.pattern(rena._ignoreExp)
+        return None if pattern is None else "(?>(?:" + pattern + ")?)"
+
+    def pattern(self, exp):
+        kind = type(exp)
+        if kind is Literal:
+            return re.escape(exp.string if isinstance(exp.string, str) else exp.string.decode("latin-1"))
+        elif id(exp) in self.fused:
+            return self.fused[id(exp)][1]
+        elif kind is Regex:
+            compiled = exp.pattern
+            if compiled.groups or compiled.flags != (re.UNICODE if isinstance(compiled.pattern, str) else 0):
+                return None
+            elif isinstance(compiled.pattern, str):
+                return "(?>" + compiled.pattern + ")"
+            return "(?>" + compiled.pattern.decode("latin-1") + ")"
+        elif kind is End:
+            return "\\Z"
+        elif kind is Lookahead:
+            pattern = self.pattern(exp.exp)
+            return None if pattern is None else ("(?=" if exp.signum else "(?!") + pattern + ")"
+        elif kind is Choice:
+            patterns = [self.pattern(child) for child in exp.exps]
+            return None if None in patterns else "(?>" + "|".join(patterns) + ")"
+        ignore = self.ignorePattern(exp.rena) if kind in (Seq, Repeat, Delimit) else None
+        if ignore is None:
+            return None
+        elif kind is Seq:
+            patterns = [self.pattern(child) for child in exp.exps]
+            return None if None in patterns else "(?>" + "".join(pattern + ignore for pattern in patterns) + ")"
+        elif exp.action is not _synthesized:
+            return None
+        elif kind is Repeat:
+            pattern = self.pattern(exp.exp)
+            if pattern is None:
+                return None
+            maxcount = "" if exp.maxcount is None else str(exp.maxcount)
+            return "(?>(?:" + pattern + ignore + "){" + str(exp.mincount) + "," + maxcount + "})"
+        else:
+            pattern, delimiter = self.pattern(exp.exp), self.pattern(exp.delimiter)
+            if pattern is None or delimiter is None:
+                return None
+            return "(?>" + pattern + "(?>" + ignore + delimiter + ignore + pattern + ")*" + ignore + ")"
+
+    def optimizeChoice(self, exp):
+        exps = []
+        for child in exp.exps:
+            if type(child) is Choice:
+                exps.extend(child.exps)
+            else:
+                exps.append(child)
+        return Choice(self.fuseRuns(tuple(exps), lambda patterns: "(?>" + "|".join(patterns) + ")"))
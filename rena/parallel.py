@@ -0,0 +1,71 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+from concurrent.futures import ProcessPoolExecutor
+from .rena import ParseError
+
+_grammars = {}
+
+def _grammar(factory):
+    if factory not in _grammars:
+        _grammars[factory] = factory()
+    return _grammars[factory]
+
+def _split(boundary, match, count):
+    starts = [0]
+    for part in range(1, count):
+        index = max(starts[-1], len(match) * part // count)
+        while index < len(match):
+            matched, indexNew, attrNew = boundary(match, index, None)
+            if matched is not None and indexNew > index:
+                break
+            index += 1
+        if index >= len(match):
+            break
+        starts.append(indexNew)
+    return [(start, end) for start, end in zip(starts, starts[1:] + [len(match)]) if start < end]
+
+def _part(match, start, end):
+    part = match[start:end]
+    return part if isinstance(part, (str, bytes)) else bytes(part)
+
+def _parseChunk(factory, match, offset, attr, combine):
+    record, boundary = _grammar(factory)
+    index = 0
+    result = None
+    while True:
+        try:
+            matched, indexNew, attrNew = record(match, index, attr)
+        except ParseError as error:
+            raise ParseError(error.message, offset + error.index)
+        if matched is None:
+            raise ParseError("record does not match", offset + index)
+        result = attrNew if index == 0 else combine(result, attrNew)
+        if indexNew == len(match):
+            return result
+        matched, index, attrNew = boundary(match, indexNew, None)
+        if matched is None:
+            raise ParseError("boundary does not match", offset + indexNew)
+        elif index == len(match):
+            return result
+
+def _parallel(factory, match, combine, attr, workers, chunkSize):
+    if not match:
+        raise ParseError("record does not match", 0)
+    record, boundary = _grammar(factory)
+    count = max(1, min(workers, len(match) // chunkSize))
+    chunks = _split(boundary, match, count)
+    if len(chunks) == 1:
+        return _parseChunk(factory, match, 0, attr, combine)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_parseChunk, factory, _part(match, start, end), start, attr, combine) for start, end in chunks]
+        results = [future.result() for future in futures]
+    result = results[0]
+    for value in results[1:]:
+        result = combine(result, value)
+    return result
@@ -0,0 +1,48 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+from .incremental import Incremental
+from .stream import _Stream, _more, _end
+
+class PushParser:
+    def __init__(self, rena, exp, attr=None):
+        self.incremental = Incremental(rena, exp)
+        self.stream = _Stream(self.incremental.tracker, self.incremental.exp, attr)
+
+    def feed(self, data):
+        stream = self.stream
+        entries = self.incremental.entries
+        length = 0 if stream.buffer is None else len(stream.buffer)
+        entries.edit(length, length + 1, len(data))
+        entries.edit(0, stream.index, -stream.index)
+        stream.feed(data)
+        return self.results()
+
+    def close(self):
+        self.stream.close()
+        return self.results()
+
+    def pending(self):
+        return self.stream.pending()
+
+    def results(self):
+        results = []
+        while True:
+            result = self.stream.parse()
+            if result is _more or result is _end:
+                return results
+            results.append(result)
+
+async def _aiterparse(rena, exp, reader, chunkSize, attr):
+    parser = PushParser(rena, exp, attr)
+    while True:
+        data = await reader.read(chunkSize)
+        for result in (parser.feed(data) if data else parser.close()):
+            yield result
+        if not data:
+            return
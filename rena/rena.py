@@ -7,261 +7,1099 @@
 # http://opensource.org/licenses/mit-license.php
 #
 import re;
+import heapq
+import os
+from array import array
+from time import perf_counter
+from collections import OrderedDict
+try:
+    from re import _parser as _sre
+except ImportError:
+    import sre_parse as _sre
+
+_realPattern = re.compile(r'[\+\-]?(?:[0-9]+(?:\.[0-9]+)?|\.[0-9]+)(?:[eE][\+\-]?[0-9]+)?')
+_realBytesPattern = re.compile(_realPattern.pattern.encode("ascii"))
+
+_tableRows = 1024
+_tables = {}
+_ignoreCacheSize = 65536
+_immutable = (str, bytes)
+_keyCacheSize = 65536
+
+def _triePattern(trie):
+    if not trie:
+        return "(?!)"
+    branches = []
+    for ch in sorted(trie):
+        child = trie[ch]
+        branches.append(re.escape(ch) + ("(?:" + _triePattern(child) + ")?" if child else ""))
+    return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+class ParseError(ValueError):
+    def __init__(self, message, index):
+        ValueError.__init__(self, message + " at " + str(index))
+        self.message = message
+        self.index = index
+
+    def __reduce__(self):
+        return (ParseError, (self.message, self.index))
+
+def _synthesized(match, synthesized, inherited):
+    return synthesized
+
+class _MemoTable:
+    def __init__(self, size=65536, eviction="lru", window=4096):
+        if eviction not in ("lru", "window"):
+            raise ValueError("unknown eviction policy: " + str(eviction))
+        self.size = size
+        self.eviction = eviction
+        self.window = window
+        self.stats = OrderedDict()
+        self.depth = 0
+        self._clear(None)
+
+    def __getstate__(self):
+        return (self.size, self.eviction, self.window, self.stats)
+
+    def __setstate__(self, state):
+        self.size, self.eviction, self.window, self.stats = state
+        self.depth = 0
+        self._clear(None)
+
+    def _clear(self, match):
+        self.match = match
+        self.entries = OrderedDict()
+        self.positions = {}
+        self.heap = []
+        self.cursor = 0
+        self.ordered = False
+        self.floor = 0
+
+    def lookup(self, match, key, attr):
+        if match is not self.match or self.depth == 0 and type(match) not in _immutable:
+            self._clear(match)
+            return None
+        entry = self.entries.get(key)
+        if entry is None or entry[0] is not attr:
+            return None
+        if self.eviction == "lru":
+            self.entries.move_to_end(key)
+        return entry[1]
+
+    def store(self, key, attr, result):
+        if key[1] < self.floor:
+            return
+        self.entries[key] = (attr, result)
+        if self.eviction == "window" or self.ordered:
+            pos = key[1]
+            if pos not in self.positions:
+                self.positions[pos] = []
+                heapq.heappush(self.heap, pos)
+            self.positions[pos].append(key)
+            if pos > self.cursor:
+                self.cursor = pos
+            while self.heap and self.heap[0] < self.cursor - self.window:
+                for old in self.positions.pop(heapq.heappop(self.heap)):
+                    self.entries.pop(old, None)
+        while self.size is not None and len(self.entries) > self.size:
+            self.entries.popitem(last=False)
+
+    def discard(self, match, index):
+        if match is not self.match:
+            return
+        self.floor = max(self.floor, index)
+        if self.eviction != "window" and not self.ordered:
+            self.ordered = True
+            for key in self.entries:
+                if key[1] not in self.positions:
+                    self.positions[key[1]] = []
+                    heapq.heappush(self.heap, key[1])
+                self.positions[key[1]].append(key)
+        while self.heap and self.heap[0] < index:
+            for old in self.positions.pop(heapq.heappop(self.heap)):
+                self.entries.pop(old, None)
+
+def _patternFirst(items, char):
+    for op, av in items:
+        if op is _sre.LITERAL:
+            return frozenset((char(av),))
+        elif op is _sre.IN:
+            chars = set()
+            for op, av in av:
+                if op is _sre.LITERAL:
+                    chars.add(char(av))
+                elif op is _sre.RANGE and av[1] - av[0] < 256:
+                    chars.update(char(code) for code in range(av[0], av[1] + 1))
+                else:
+                    return None
+            return frozenset(chars)
+        elif op is _sre.SUBPATTERN:
+            return None if av[1] else _patternFirst(av[3], char)
+        elif op is _sre.BRANCH:
+            firsts = [_patternFirst(branch, char) for branch in av[1]]
+            return None if None in firsts else frozenset().union(*firsts)
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", None)):
+            return _patternFirst(av[2], char) if av[0] > 0 else None
+        elif op is getattr(_sre, "ATOMIC_GROUP", None):
+            return _patternFirst(av, char)
+        else:
+            return None
+    return None
+
+def _regexFirst(pattern):
+    if pattern.flags & re.IGNORECASE:
+        return None
+    try:
+        return _patternFirst(_sre.parse(pattern.pattern, pattern.flags), chr if isinstance(pattern.pattern, str) else int)
+    except Exception:
+        return None
+
+def _first(exp, visiting=()):
+    kind = type(exp)
+    if kind is Literal:
+        return frozenset((exp.string[0],)) if exp.string else None
+    elif kind is Regex or kind is Real:
+        return _regexFirst(exp.pattern)
+    elif kind is Key:
+        return frozenset((exp.key[0],)) if exp.key else None
+    elif kind is RealTable:
+        return _regexFirst(_tablePatterns(exp.separator).row)
+    elif kind is Seq:
+        return _first(exp.exps[0], visiting) if exp.exps else None
+    elif kind is Choice:
+        firsts = [_first(child, visiting) for child in exp.exps]
+        return None if None in firsts else frozenset().union(*firsts)
+    elif kind is Repeat:
+        return _first(exp.exp, visiting) if exp.mincount > 0 else None
+    elif kind in (Delimit, Action, EqualsId, Memo, Profile):
+        return _first(exp.exp, visiting)
+    elif kind is Rule:
+        return None if exp in visiting or exp.exp is None else _first(exp.exp, visiting + (exp,))
+    else:
+        return None
+
+def _dispatchTable(exps):
+    firsts = [_first(exp) for exp in exps]
+    if len(exps) < 2 or len([first for first in firsts if first is not None]) < 2:
+        return ()
+    chars = frozenset().union(*[first for first in firsts if first is not None])
+    dispatch = {}
+    for ch in chars:
+        dispatch[ch] = tuple(exp for exp, first in zip(exps, firsts) if first is None or ch in first)
+    return (dispatch, tuple(exp for exp, first in zip(exps, firsts) if first is None))
+
+_collectors = ("list", "join", "sum", "count", "dict")
+
+class Collector:
+    __slots__ = ("kind", "separator")
+
+    def __init__(self, kind, separator):
+        if kind not in _collectors:
+            raise ValueError("unknown collector: " + str(kind))
+        self.kind = kind
+        self.separator = separator
+
+    def __repr__(self):
+        return "Collector(" + repr(self.kind) + ("" if self.kind != "join" else ", " + repr(self.separator)) + ")"
+
+    def values(self):
+        return None if self.kind == "count" else []
+
+    def finish(self, values, count):
+        kind = self.kind
+        if kind == "list":
+            return values
+        elif kind == "join":
+            return self.separator.join(values)
+        elif kind == "sum":
+            return sum(values)
+        elif kind == "dict":
+            return dict(values)
+        return count
+
+def _slice(match, start, end):
+    part = match[start:end]
+    return bytes(part) if type(part) is memoryview else part
+
+def _text(match, matched):
+    if type(matched) is tuple:
+        return match[matched[0]:matched[1]]
+    return matched
+
+def _fields(kind):
+    fields = []
+    for base in reversed(kind.__mro__):
+        fields.extend(base.__dict__.get("__slots__", ()))
+    return fields
+
+class Node:
+    __slots__ = ()
+
+    def __repr__(self):
+        fields = [getattr(self, name) for name in _fields(type(self)) if name != "rena" and name != "dispatch"]
+        return type(self).__name__ + "(" + ", ".join(repr(field) for field in fields) + ")"
+
+class Literal(Node):
+    __slots__ = ("rena", "string")
+
+    def __init__(self, rena, string):
+        self.rena = rena
+        self.string = string
+
+    def __call__(self, match, lastIndex, attr):
+        if self.rena._bytes:
+            found = match[lastIndex:lastIndex + len(self.string)] == self.string
+        else:
+            found = match.startswith(self.string, lastIndex)
+        if found:
+            if self.rena._spans:
+                return ((lastIndex, lastIndex + len(self.string)), lastIndex + len(self.string), attr)
+            return (self.string, lastIndex + len(self.string), attr)
+        else:
+            return (None, None, None)
+
+class Regex(Node):
+    __slots__ = ("rena", "pattern")
+
+    def __init__(self, rena, pattern):
+        self.rena = rena
+        self.pattern = pattern
+
+    def __call__(self, match, lastIndex, attr):
+        result = self.pattern.match(match, lastIndex)
+        if result:
+            if self.rena._spans:
+                return ((lastIndex, result.end()), result.end(), attr)
+            return (result.group(0), result.end(), attr)
+        else:
+            return (None, None, None)
+
+class Real(Regex):
+    __slots__ = ()
+
+    def __call__(self, match, lastIndex, attr):
+        result = self.pattern.match(match, lastIndex)
+        if result:
+            matched = result.group(0)
+            value = float(bytes(matched)) if self.rena._bytes else float(matched)
+            if self.rena._spans:
+                return ((lastIndex, result.end()), result.end(), value)
+            return (matched, result.end(), value)
+        else:
+            return (None, None, None)
+
+class Seq(Node):
+    __slots__ = ("rena", "exps")
+
+    def __init__(self, rena, exps):
+        self.rena = rena
+        self.exps = exps
+
+    def __call__(self, match, lastIndex, attr):
+        indexNew = lastIndex
+        attrNew = attr
+        if self.rena._ignoreExp is None:
+            for exp in self.exps:
+                matched, indexNew, attrNew = exp(match, indexNew, attrNew)
+                if matched is None:
+                    return (None, None, None)
+        else:
+            ignore = self.rena._ignore
+            for exp in self.exps:
+                matched, indexNew, attrNew = exp(match, indexNew, attrNew)
+                if matched is None:
+                    return (None, None, None)
+                indexNew = ignore(match, indexNew)
+        if self.rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+class Choice(Node):
+    __slots__ = ("exps", "dispatch")
+
+    def __init__(self, exps):
+        self.exps = exps
+        self.dispatch = None
+
+    def __call__(self, match, lastIndex, attr):
+        dispatch = self.dispatch
+        if dispatch is None:
+            dispatch = self.dispatch = _dispatchTable(self.exps)
+        if not dispatch:
+            exps = self.exps
+        elif lastIndex < len(match):
+            exps = dispatch[0].get(match[lastIndex], dispatch[1])
+        else:
+            exps = dispatch[1]
+        for exp in exps:
+            result = exp(match, lastIndex, attr)
+            if result[0] is not None:
+                return result
+        return (None, None, None)
+
+class Repeat(Node):
+    __slots__ = ("rena", "mincount", "maxcount", "exp", "action")
+
+    def __init__(self, rena, mincount, maxcount, exp, action):
+        self.rena = rena
+        self.mincount = mincount
+        self.maxcount = maxcount
+        self.exp = exp
+        self.action = action
+
+    def __call__(self, match, lastIndex, attr):
+        exp = self.exp
+        action = self.action
+        maxcount = self.maxcount
+        rena = self.rena
+        ignore = rena._ignore
+        if type(action) is Collector:
+            return self.collect(match, lastIndex, attr)
+        indexNew = lastIndex
+        attrNew = attr
+        count = 0
+        while maxcount is None or count < maxcount:
+            matchedLoop, indexLoop, attrLoop = exp(match, indexNew, attrNew)
+            if matchedLoop is None:
+                break
+            indexNew = ignore(match, indexLoop)
+            if action is _synthesized:
+                attrNew = attrLoop
+            else:
+                attrNew = action(_text(match, matchedLoop), attrLoop, attrNew)
+            count = count + 1
+        if count < self.mincount:
+            return (None, None, None)
+        if rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+    def collect(self, match, lastIndex, attr):
+        exp = self.exp
+        maxcount = self.maxcount
+        rena = self.rena
+        ignore = rena._ignore
+        values = self.action.values()
+        append = None if values is None else values.append
+        text = self.action.kind == "join"
+        indexNew = lastIndex
+        attrNew = attr
+        count = 0
+        while maxcount is None or count < maxcount:
+            matchedLoop, indexLoop, attrLoop = exp(match, indexNew, attrNew)
+            if matchedLoop is None:
+                break
+            indexNew = ignore(match, indexLoop)
+            attrNew = attrLoop
+            if append is not None:
+                append(_text(match, matchedLoop) if text else attrLoop)
+            count = count + 1
+        if count < self.mincount:
+            return (None, None, None)
+        attrNew = self.action.finish(values, count)
+        if rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+class Delimit(Node):
+    __slots__ = ("rena", "exp", "delimiter", "action")
+
+    def __init__(self, rena, exp, delimiter, action):
+        self.rena = rena
+        self.exp = exp
+        self.delimiter = delimiter
+        self.action = action
+
+    def __call__(self, match, lastIndex, attr):
+        exp = self.exp
+        delimiter = self.delimiter
+        action = self.action
+        rena = self.rena
+        ignore = rena._ignore
+        if type(action) is Collector:
+            return self.collect(match, lastIndex, attr)
+        indexNew = lastIndex
+        attrNew = attr
+        indexLoop, attrLoop = lastIndex, attr
+        already = False
+        while True:
+            matchedLoop, indexLoop, attrLoop = exp(match, indexLoop, attrLoop)
+            if matchedLoop is None:
+                break
+            already = True
+            indexNew = indexLoop
+            if action is _synthesized:
+                attrNew = attrLoop
+            else:
+                attrNew = action(_text(match, matchedLoop), attrLoop, attrNew)
+            indexLoop = ignore(match, indexLoop)
+            matchedLoop, indexLoop, attrLoop = delimiter(match, indexLoop, attrLoop)
+            if matchedLoop is None:
+                break
+            indexLoop = ignore(match, indexLoop)
+        if not already:
+            return (None, None, None)
+        indexNew = ignore(match, indexNew)
+        if rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+    def collect(self, match, lastIndex, attr):
+        exp = self.exp
+        delimiter = self.delimiter
+        rena = self.rena
+        ignore = rena._ignore
+        values = self.action.values()
+        append = None if values is None else values.append
+        text = self.action.kind == "join"
+        indexNew = lastIndex
+        indexLoop, attrLoop = lastIndex, attr
+        count = 0
+        while True:
+            matchedLoop, indexLoop, attrLoop = exp(match, indexLoop, attrLoop)
+            if matchedLoop is None:
+                break
+            count = count + 1
+            indexNew = indexLoop
+            if append is not None:
+                append(_text(match, matchedLoop) if text else attrLoop)
+            indexLoop = ignore(match, indexLoop)
+            matchedLoop, indexLoop, attrLoop = delimiter(match, indexLoop, attrLoop)
+            if matchedLoop is None:
+                break
+            indexLoop = ignore(match, indexLoop)
+        if count == 0:
+            return (None, None, None)
+        attrNew = self.action.finish(values, count)
+        indexNew = ignore(match, indexNew)
+        if rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+class _TablePatterns:
+    def __init__(self, separator):
+        self.separator = separator
+        self.row = self.compile(self.real() + "(?:" + self.escape() + self.real() + ")*")
+        self.split = self.compile(self.escape() + r"|\r\n|\r|\n")
+        self.newline = self.compile(r"\r\n|\r|\n")
+        self.blocks = {}
+
+    def real(self):
+        return _realPattern.pattern
+
+    def escape(self):
+        separator = self.separator
+        return re.escape(separator.decode("latin-1") if type(separator) is bytes else separator)
+
+    def compile(self, pattern):
+        return re.compile(pattern.encode("latin-1") if type(self.separator) is bytes else pattern)
+
+    def columns(self, match, start, end):
+        return _slice(match, start, end).count(self.separator) + 1
+
+    def block(self, columns):
+        if columns not in self.blocks:
+            row = self.real() + "(?:" + self.escape() + self.real() + "){" + str(columns - 1) + "}"
+            self.blocks[columns] = (self.compile("(?:" + row + r"(?:\r\n|\r|\n)){1," + str(_tableRows) + "}"),
+                self.compile(row + r"\Z"))
+        return self.blocks[columns]
+
+def _tablePatterns(separator):
+    if separator not in _tables:
+        _tables[separator] = _TablePatterns(separator)
+    return _tables[separator]
+
+class RealTable(Node):
+    __slots__ = ("rena", "separator", "numpy", "action")
+
+    def __init__(self, rena, separator, numpy, action):
+        self.rena = rena
+        self.separator = separator
+        self.numpy = numpy
+        self.action = action
+
+    def __call__(self, match, lastIndex, attr):
+        patterns = _tablePatterns(self.separator)
+        first = patterns.row.match(match, lastIndex)
+        if first is None:
+            return (None, None, None)
+        columns = patterns.columns(match, lastIndex, first.end())
+        block, last = patterns.block(columns)
+        split = patterns.split.split
+        data = array("d")
+        index = lastIndex
+        while True:
+            result = block.match(match, index)
+            if result is None:
+                break
+            values = split(_slice(match, index, result.end()))
+            values.pop()
+            data.extend(map(float, values))
+            index = result.end()
+        result = last.match(match, index)
+        if result is not None:
+            data.extend(map(float, split(_slice(match, index, result.end()))))
+            index = result.end()
+        else:
+            row = patterns.row.match(match, index)
+            if row is not None and (row.end() == len(match) or patterns.newline.match(match, row.end())):
+                raise ParseError("row has " + str(patterns.columns(match, index, row.end())) + " columns instead of " +
+                    str(columns), index)
+            elif row is not None:
+                raise ParseError("malformed row", row.end())
+        if self.numpy:
+            import numpy
+            table = numpy.frombuffer(data, dtype=numpy.float64).reshape(len(data) // columns, columns)
+        else:
+            table = memoryview(data).cast("B").cast("d", (len(data) // columns, columns))
+        attrNew = table if self.action is _synthesized else self.action(_slice(match, lastIndex, index), table, attr)
+        if self.rena._spans:
+            return ((lastIndex, index), index, attrNew)
+        return (match[lastIndex:index], index, attrNew)
+
+class Lookahead(Node):
+    __slots__ = ("rena", "exp", "signum")
+
+    def __init__(self, rena, exp, signum):
+        self.rena = rena
+        self.exp = exp
+        self.signum = signum
+
+    def __call__(self, match, lastIndex, attr):
+        matched, indexNew, attrNew = self.exp(match, lastIndex, attr)
+        if (matched is not None) == self.signum:
+            return ((lastIndex, lastIndex) if self.rena._spans else "", lastIndex, attr)
+        else:
+            return (None, None, None)
+
+class Cut(Node):
+    __slots__ = ("rena",)
+
+    def __init__(self, rena):
+        self.rena = rena
+
+    def __call__(self, match, lastIndex, attr):
+        if self.rena._memoTable is not None:
+            self.rena._memoTable.discard(match, lastIndex)
+        return ((lastIndex, lastIndex) if self.rena._spans else "", lastIndex, attr)
+
+class Commit(Node):
+    __slots__ = ("rena", "exps")
+
+    def __init__(self, rena, exps):
+        self.rena = rena
+        self.exps = exps
+
+    def __call__(self, match, lastIndex, attr):
+        rena = self.rena
+        exps = self.exps
+        if rena._memoTable is not None:
+            rena._memoTable.discard(match, lastIndex)
+        matched, indexNew, attrNew = exps[0](match, lastIndex, attr)
+        for exp in exps[1:]:
+            if matched is None:
+                break
+            matched, indexNew, attrNew = exp(match, rena._ignore(match, indexNew), attrNew)
+        if matched is None:
+            raise ParseError("committed expression does not match", lastIndex)
+        elif len(exps) == 1:
+            return (matched, indexNew, attrNew)
+        elif rena._spans:
+            return ((lastIndex, indexNew), indexNew, attrNew)
+        return (match[lastIndex:indexNew], indexNew, attrNew)
+
+class Attr(Node):
+    __slots__ = ("rena", "value")
+
+    def __init__(self, rena, value):
+        self.rena = rena
+        self.value = value
+
+    def __call__(self, match, lastIndex, attr):
+        return ((lastIndex, lastIndex) if self.rena._spans else match, lastIndex, self.value)
+
+class Cond(Node):
+    __slots__ = ("rena", "predicate")
+
+    def __init__(self, rena, predicate):
+        self.rena = rena
+        self.predicate = predicate
+
+    def __call__(self, match, lastIndex, attr):
+        if self.predicate(attr):
+            return ((lastIndex, lastIndex) if self.rena._spans else "", lastIndex, attr)
+        else:
+            return (None, None, None)
+
+class Action(Node):
+    __slots__ = ("rena", "exp", "action")
+
+    def __init__(self, rena, exp, action):
+        self.rena = rena
+        self.exp = exp
+        self.action = action
+
+    def __call__(self, match, lastIndex, attr):
+        matched, indexNew, attrNew = self.exp(match, lastIndex, attr)
+        if matched is None:
+            return (None, None, None)
+        else:
+            return (matched, indexNew, self.action(_text(match, matched), attrNew, attr))
+
+class Key(Node):
+    __slots__ = ("rena", "key")
+
+    def __init__(self, rena, key):
+        self.rena = rena
+        self.key = key
+
+    def __call__(self, match, lastIndex, attr):
+        if self.rena._findKey(match, lastIndex) == self.key:
+            if self.rena._spans:
+                return ((lastIndex, lastIndex + len(self.key)), lastIndex + len(self.key), attr)
+            return (self.key, lastIndex + len(self.key), attr)
+        else:
+            return (None, None, None)
+
+class NotKey(Node):
+    __slots__ = ("rena",)
+
+    def __init__(self, rena):
+        self.rena = rena
+
+    def __call__(self, match, lastIndex, attr):
+        if not self.rena._findKey(match, lastIndex):
+            return ((lastIndex, lastIndex) if self.rena._spans else "", lastIndex, attr)
+        else:
+            return (None, None, None)
+
+class EqualsId(Node):
+    __slots__ = ("rena", "exp")
+
+    def __init__(self, rena, exp):
+        self.rena = rena
+        self.exp = exp
+
+    def __call__(self, match, lastIndex, attr):
+        rena = self.rena
+        matched, indexNew, attrNew = self.exp(match, lastIndex, attr)
+        if matched is None:
+            return (None, None, None)
+        elif indexNew == len(match):
+            return (matched, indexNew, attrNew)
+        elif rena._ignoreExp is None and rena._keyPattern is None:
+            return (matched, indexNew, attrNew)
+        if rena._ignoreExp is not None:
+            indexIgnore = rena._ignore(match, indexNew)
+            if indexIgnore != indexNew:
+                return (matched, indexIgnore, attrNew)
+        if rena._keyPattern is not None and rena._findKey(match, indexNew):
+            return (matched, indexNew, attrNew)
+        else:
+            return (None, None, None)
+
+class End(Node):
+    __slots__ = ("rena",)
+
+    def __init__(self, rena):
+        self.rena = rena
+
+    def __call__(self, match, lastIndex, attr):
+        if lastIndex == len(match):
+            return ((lastIndex, lastIndex) if self.rena._spans else "", lastIndex, attr)
+        else:
+            return (None, None, None)
+
+class Memo(Node):
+    __slots__ = ("table", "memoId", "counter", "exp")
+
+    def __init__(self, table, memoId, counter, exp):
+        self.table = table
+        self.memoId = memoId
+        self.counter = counter
+        self.exp = exp
+
+    def __repr__(self):
+        return "Memo(" + repr(self.exp) + ")"
+
+    def __call__(self, match, lastIndex, attr):
+        table = self.table
+        key = (self.memoId, lastIndex, id(attr))
+        result = table.lookup(match, key, attr)
+        if result is None:
+            self.counter["misses"] += 1
+            table.depth += 1
+            try:
+                result = self.exp(match, lastIndex, attr)
+            finally:
+                table.depth -= 1
+            table.store(key, attr, result)
+        else:
+            self.counter["hits"] += 1
+        return result
+
+class _ProfileCounter:
+    __slots__ = ("calls", "successes", "failures", "time", "selfTime", "positions", "repeats", "match", "seen")
+
+    def __init__(self):
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.time = 0.0
+        self.selfTime = 0.0
+        self.positions = 0
+        self.repeats = 0
+        self.match = None
+        self.seen = set()
+
+    def stats(self):
+        return dict((name, getattr(self, name)) for name in _ProfileCounter.__slots__[:7])
+
+    def __getstate__(self):
+        return self.stats()
+
+    def __setstate__(self, state):
+        for name, value in state.items():
+            setattr(self, name, value)
+        self.match = None
+        self.seen = set()
+
+class Profile(Node):
+    __slots__ = ("rena", "name", "counter", "exp")
+
+    def __init__(self, rena, name, counter, exp):
+        self.rena = rena
+        self.name = name
+        self.counter = counter
+        self.exp = exp
+
+    def __repr__(self):
+        return "Profile(" + repr(self.name) + ", " + repr(self.exp) + ")"
+
+    def enter(self, match, lastIndex):
+        counter = self.counter
+        counter.calls += 1
+        if match is not counter.match:
+            counter.match = match
+            counter.seen = set()
+        if lastIndex in counter.seen:
+            counter.repeats += 1
+        else:
+            counter.seen.add(lastIndex)
+            counter.positions += 1
+        rena = self.rena
+        if match is not rena._profileMatch:
+            rena._profileMatch = match
+            rena._profileStack = []
+        rena._profileStack.append(0.0)
+        return perf_counter()
+
+    def leave(self, start, matched):
+        elapsed = perf_counter() - start
+        counter = self.counter
+        stack = self.rena._profileStack
+        children = stack.pop() if stack else 0.0
+        if stack:
+            stack[-1] += elapsed
+        counter.time += elapsed
+        counter.selfTime += elapsed - children
+        if matched is None:
+            counter.failures += 1
+        else:
+            counter.successes += 1
+
+    def __call__(self, match, lastIndex, attr):
+        start = self.enter(match, lastIndex)
+        result = (None, None, None)
+        try:
+            result = self.exp(match, lastIndex, attr)
+        finally:
+            self.leave(start, result[0])
+        return result
+
+class Rule(Node):
+    __slots__ = ("name", "exp")
+
+    def __init__(self, name, exp=None):
+        self.name = name
+        self.exp = exp
+
+    def __repr__(self):
+        return "Rule(" + repr(self.name) + ")"
+
+    def __call__(self, match, lastIndex, attr):
+        return self.exp(match, lastIndex, attr)
 
 class Rena:
     def __init__(self, option={}):
+        self._fuse = option["fuse"] if "fuse" in option else True
+        self._spans = option["spans"] if "spans" in option else False
+        self._bytes = bool(option["bytes"]) if "bytes" in option else False
+        self._encoding = option["bytes"] if self._bytes and type(option["bytes"]) is str else "utf-8"
+        self._memoTable = None
+        self._memoRules = False
+        self._profile = OrderedDict() if "profile" in option and option["profile"] else None
+        self._profileMatch = None
+        self._profileStack = []
+        if "memo" in option and option["memo"]:
+            memoOption = option["memo"] if type(option["memo"]) is dict else {}
+            self._memoTable = _MemoTable(**memoOption)
+            self._memoRules = True
         self._ignoreExp = None
+        self._ignorePattern = None
+        self._ignoreMatch = None
+        self._ignoreCache = {}
         if "ignore" in option:
-            rbase = Rena()
+            rbase = Rena({ "bytes": option["bytes"] } if self._bytes else {})
             self._ignoreExp = rbase.wrap(option["ignore"])
-        self._trie = None
+            if type(self._ignoreExp) is Literal:
+                self._ignorePattern = re.compile(re.escape(self._ignoreExp.string))
+            elif isinstance(self._ignoreExp, Regex):
+                self._ignorePattern = self._ignoreExp.pattern
+        self._keyPattern = None
+        self._keySet = frozenset()
+        self._noKey = b"" if self._bytes else ""
+        self._keyMatch = None
+        self._keyCache = {}
         if "keys" in option:
-            self._trie = { "trie": {}, "terminate": False }
-            for key in option["keys"]:
-                trie = self._trie
-                for ch in key:
-                    if not ch in trie["trie"]:
-                        trie["trie"][ch] = { "trie": {}, "terminate": False }
-                    trie = trie["trie"][ch]
-                trie["terminate"] = True
+            keys = [self._encode(key) for key in option["keys"]]
+            trie = {}
+            for key in keys:
+                node = trie
+                for ch in (key.decode("latin-1") if self._bytes else key):
+                    node = node.setdefault(ch, {})
+            pattern = _triePattern(trie)
+            self._keyPattern = re.compile(pattern.encode("latin-1") if self._bytes else pattern)
+            self._keySet = frozenset(keys)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state.update(_ignoreMatch=None, _ignoreCache={}, _keyMatch=None, _keyCache={},
+            _profileMatch=None, _profileStack=[])
+        return state
 
     def _ignore(self, match, lastIndex):
         if self._ignoreExp is None:
             return lastIndex
-        else:
+        elif self._ignorePattern is not None:
+            result = self._ignorePattern.match(match, lastIndex)
+            return lastIndex if result is None else result.end()
+        if type(match) not in _immutable:
+            matched, indexNew, attrNew = self._ignoreExp(match, lastIndex, 0)
+            return lastIndex if matched is None else indexNew
+        if match is not self._ignoreMatch or len(self._ignoreCache) > _ignoreCacheSize:
+            self._ignoreMatch = match
+            self._ignoreCache = {}
+        indexNew = self._ignoreCache.get(lastIndex)
+        if indexNew is None:
             matched, indexNew, attrNew = self._ignoreExp(match, lastIndex, 0)
             if matched is None:
-                return lastIndex
-            else:
-                return indexNew
+                indexNew = lastIndex
+            self._ignoreCache[lastIndex] = indexNew
+        return indexNew
 
     def _findKey(self, match, lastIndex):
-        if self._trie is None:
-            return ""
-        trie = self._trie
-        i = lastIndex
-        while i < len(match):
-            ch = match[i]
-            if ch in trie["trie"]:
-                trie = trie["trie"][ch]
-                i += 1
-            else:
-                break
-        return match[lastIndex:i] if trie["terminate"] else ""
+        if self._keyPattern is None:
+            return self._noKey
+        if type(match) not in _immutable:
+            return self._matchKey(match, lastIndex)
+        if match is not self._keyMatch or len(self._keyCache) > _keyCacheSize:
+            self._keyMatch = match
+            self._keyCache = {}
+        key = self._keyCache.get(lastIndex, False)
+        if key is False:
+            key = self._matchKey(match, lastIndex)
+            self._keyCache[lastIndex] = key
+        return key
+
+    def _matchKey(self, match, lastIndex):
+        result = self._keyPattern.match(match, lastIndex)
+        key = self._noKey if result is None else result.group(0)
+        if self._bytes:
+            key = bytes(key)
+        return key if key in self._keySet else self._noKey
+
+    def _encode(self, string):
+        return string.encode(self._encoding) if self._bytes and type(string) is str else string
 
     def wrap(self, obj):
-        if type(obj) is str:
-            def process(match, lastIndex, attr):
-                if match.startswith(obj, lastIndex):
-                    return (obj, lastIndex + len(obj), attr)
-                else:
-                    return (None, None, None)
-            return process
+        if type(obj) is str or type(obj) is bytes:
+            return Literal(self, self._encode(obj))
         else:
             return obj
 
     def re(self, pattern):
-        compiledRe = re.compile(pattern)
-        def process(match, lastIndex, attr):
-            result = compiledRe.match(match, lastIndex)
-            if result:
-                return (result.group(0), lastIndex + len(result.group(0)), attr)
-            else:
-                return (None, None, None)
-        return process
+        return Regex(self, re.compile(self._encode(pattern)))
+
+    def _cut(self, kind, exps):
+        for index, exp in enumerate(exps[:-1]):
+            if type(exp) is Cut:
+                return kind(self, exps[:index] + (self._cut(Commit, exps[index + 1:]),))
+        return kind(self, exps)
 
     def then(self, *exps):
-        def process(match, lastIndex, attr):
-            matched = ""
-            indexNew = lastIndex
-            attrNew = attr
-            for exp in exps:
-                wrapped = self.wrap(exp)
-                matched, indexNew, attrNew = wrapped(match, indexNew, attrNew)
-                if matched is None:
-                    return (None, None, None)
-                else:
-                    indexNew = self._ignore(match, indexNew)
-            return (match[lastIndex:indexNew], indexNew, attrNew)
-        return process
+        return self._cut(Seq, tuple(self.wrap(exp) for exp in exps))
 
     def choice(self, *exps):
-        def process(match, lastIndex, attr):
-            for exp in exps:
-                wrapped = self.wrap(exp)
-                matched, indexNew, attrNew = wrapped(match, lastIndex, attr)
-                if matched is not None:
-                    return (matched, indexNew, attrNew)
-            return (None, None, None)
-        return process
-
-    def times(self, mincount, maxcount, exp, action=lambda match, syn, inh: syn):
-        wrapped = self.wrap(exp)
-        def process(match, lastIndex, attr):
-            matched = ""
-            indexNew = lastIndex
-            attrNew = attr
-            count = 0
-            matchedLoop, indexLoop, attrLoop = "", lastIndex, attr
-            while maxcount is None or count < maxcount:
-                matchedLoop, indexLoop, attrLoop = wrapped(match, indexNew, attrNew)
-                if matchedLoop is None:
-                    if count < mincount:
-                        return (None, None, None)
-                    else:
-                        return (match[lastIndex:indexNew], indexNew, attrNew)
-                else:
-                    indexNew = self._ignore(match, indexLoop)
-                    attrNew = action(matchedLoop, attrLoop, attrNew)
-                    count = count + 1
-            return (match[lastIndex:indexNew], indexNew, attrNew)
-        return process
+        return Choice(tuple(self.wrap(exp) for exp in exps))
 
-    def atLeast(self, mincount, exp, action=lambda match, syn, inh: syn):
+    def times(self, mincount, maxcount, exp, action=_synthesized):
+        return Repeat(self, mincount, maxcount, self.wrap(exp), action)
+
+    def atLeast(self, mincount, exp, action=_synthesized):
         return self.times(mincount, None, exp, action)
 
-    def atMost(self, maxcount, exp, action=lambda match, syn, inh: syn):
+    def atMost(self, maxcount, exp, action=_synthesized):
         return self.times(0, maxcount, exp, action)
 
-    def oneOrMore(self, exp, action=lambda match, syn, inh: syn):
+    def oneOrMore(self, exp, action=_synthesized):
         return self.times(1, None, exp, action)
 
-    def zeroOrMore(self, exp, action=lambda match, syn, inh: syn):
+    def zeroOrMore(self, exp, action=_synthesized):
         return self.times(0, None, exp, action)
 
     def maybe(self, exp):
         return self.times(0, 1, exp)
 
-    def delimit(self, exp, delimiter, action=lambda match, syn, inh: syn):
-        wrapped = self.wrap(exp)
-        wrappedDelimiter = self.wrap(delimiter)
-        def process(match, lastIndex, attr):
-            matched = ""
-            indexNew = lastIndex
-            attrNew = attr
-            matchedLoop, indexLoop, attrLoop = "", lastIndex, attr
-            already = False
-            while True:
-                matchedLoop, indexLoop, attrLoop = wrapped(match, indexLoop, attrLoop)
-                if matchedLoop is None:
-                    if already:
-                        indexNew = self._ignore(match, indexNew)
-                        return (match[lastIndex:indexNew], indexNew, attrNew)
-                    else:
-                        return (None, None, None)
-                else:
-                    already = True
-                    matched, indexNew, attrNew = matchedLoop, indexLoop, action(matchedLoop, attrLoop, attrNew)
-                    indexLoop = self._ignore(match, indexLoop)
-                    matchedLoop, indexLoop, attrLoop = wrappedDelimiter(match, indexLoop, attrLoop)
-                    if matchedLoop is None:
-                        indexNew = self._ignore(match, indexNew)
-                        return (match[lastIndex:indexNew], indexNew, attrNew)
-                    indexLoop = self._ignore(match, indexLoop)
-        return process
+    def delimit(self, exp, delimiter, action=_synthesized):
+        return Delimit(self, self.wrap(exp), self.wrap(delimiter), action)
+
+    def realTable(self, separator=",", numpy=False, action=_synthesized):
+        return RealTable(self, self._encode(separator), numpy, action)
+
+    def collect(self, kind, separator=""):
+        return Collector(kind, self._encode(separator))
 
     def lookahead(self, exp, signum=True):
-        wrapped = self.wrap(exp)
-        def process(match, lastIndex, attr):
-            matched, indexNew, attrNew = wrapped(match, lastIndex, attr)
-            if (signum and matched is not None) or (not signum and matched is None):
-                return ("", lastIndex, attr)
-            else:
-                return (None, None, None)
-        return process
+        return Lookahead(self, self.wrap(exp), signum)
 
     def lookaheadNot(self, exp):
         return self.lookahead(exp, False)
 
+    def cut(self):
+        return Cut(self)
+
+    def commit(self, *exps):
+        return self._cut(Commit, tuple(self.wrap(exp) for exp in exps))
+
     def attr(self, attr):
-        return lambda match, lastIndex, attrOld: (match, lastIndex, attr)
+        return Attr(self, attr)
 
     def cond(self, predicate):
-        def process(match, lastIndex, attr):
-            if predicate(attr):
-                return ("", lastIndex, attr)
-            else:
-                return (None, None, None)
-        return process
+        return Cond(self, predicate)
 
     def action(self, exp, action):
-        wrapped = self.wrap(exp)
-        def process(match, lastIndex, attr):
-            matched, indexNew, attrNew = wrapped(match, lastIndex, attr)
-            if matched is None:
-                return (None, None, None)
-            else:
-                return (matched, indexNew, action(matched, attrNew, attr))
-        return process
+        return Action(self, self.wrap(exp), action)
 
     def key(self, key):
-        def process(match, lastIndex, attr):
-            matchedKey = self._findKey(match, lastIndex)
-            if matchedKey == key:
-                return (key, lastIndex + len(key), attr)
-            else:
-                return (None, None, None)
-        return process
+        return Key(self, self._encode(key))
 
     def notKey(self):
-        def process(match, lastIndex, attr):
-            matchedKey = self._findKey(match, lastIndex)
-            if matchedKey == "":
-                return ("", lastIndex, attr)
-            else:
-                return (None, None, None)
-        return process
+        return NotKey(self)
 
     def equalsId(self, keyword):
-        wrapped = self.wrap(keyword)
-        def process(match, lastIndex, attr):
-            matched, indexNew, attrNew = wrapped(match, lastIndex, attr)
-            if matched is None:
-                return (None, None, None)
-            elif indexNew == len(match):
-                return (matched, indexNew, attrNew)
-            elif self._ignoreExp is None and self._trie is None:
-                return (matched, indexNew, attrNew)
-            elif self._ignoreExp is not None and self._ignore(match, indexNew) != indexNew:
-                return (matched, self._ignore(match, indexNew), attrNew)
-            elif self._trie is not None and self._findKey(match, indexNew) != "":
-                return (matched, indexNew, attrNew)
-            else:
-                return (None, None, None)
-        return process
+        return EqualsId(self, self.wrap(keyword))
 
     def real(self):
-        realPattern = re.compile(r'[\+\-]?(?:[0-9]+(?:\.[0-9]+)?|\.[0-9]+)(?:[eE][\+\-]?[0-9]+)?')
-        def process(match, lastIndex, attr):
-            matched = realPattern.match(match, lastIndex)
-            if matched:
-                return (matched.group(0), lastIndex + len(matched.group(0)), float(matched.group(0)))
-            else:
-                return (None, None, None)
-        return process
+        return Real(self, _realBytesPattern if self._bytes else _realPattern)
 
     def br(self):
         return self.re(r'\r\n|\r|\n')
 
     def end(self):
-        def process(match, lastIndex, attr):
-            if lastIndex == len(match):
-                return ("", lastIndex, attr)
-            else:
-                return (None, None, None)
-        return process
+        return End(self)
+
+    def _memoSlot(self, name):
+        if self._memoTable is None:
+            self._memoTable = _MemoTable()
+        stats = self._memoTable.stats
+        if name is None:
+            name = "memo#" + str(len(stats))
+        while name in stats:
+            name = name + "'"
+        stats[name] = { "hits": 0, "misses": 0 }
+        return (len(stats), stats[name])
+
+    def memo(self, exp, name=None):
+        memoId, counter = self._memoSlot(name)
+        return Memo(self._memoTable, memoId, counter, self.wrap(exp))
+
+    def name(self, name, exp):
+        if self._profile is None:
+            return self.wrap(exp)
+        if name not in self._profile:
+            self._profile[name] = _ProfileCounter()
+        return Profile(self, name, self._profile[name], self.wrap(exp))
+
+    def profileStats(self):
+        if self._profile is None:
+            return {}
+        return dict((name, counter.stats()) for name, counter in self._profile.items())
+
+    def profileReport(self, sort="selfTime"):
+        columns = _ProfileCounter.__slots__[:7]
+        stats = sorted(self.profileStats().items(), key=lambda item: item[1][sort], reverse=True)
+        width = max([len("name")] + [len(name) for name, counter in stats])
+        lines = [" ".join(["%-*s" % (width, "name")] + ["%10s" % column for column in columns])]
+        for name, counter in stats:
+            lines.append(" ".join(["%-*s" % (width, name)] +
+                ["%10.6f" % counter[column] if type(counter[column]) is float else "%10d" % counter[column] for column in columns]))
+        return "\n".join(lines)
+
+    def optimize(self, exp):
+        from .optimizer import Optimizer
+        return Optimizer(self).optimize(self.wrap(exp))
+
+    def compile(self, exp):
+        from .compiler import Compiler
+        return Compiler(self).compile(self.optimize(exp))
+
+    def iterparse(self, exp, fileobj, chunkSize=65536, attr=None):
+        from .stream import _iterparse
+        return _iterparse(self, exp, fileobj, chunkSize, attr)
+
+    def pushParser(self, exp, attr=None):
+        from .push import PushParser
+        return PushParser(self, exp, attr)
+
+    def aiterparse(self, exp, reader, chunkSize=65536, attr=None):
+        from .push import _aiterparse
+        return _aiterparse(self, exp, reader, chunkSize, attr)
+
+    def parallel(self, factory, match, combine, attr=None, workers=None, chunkSize=1048576):
+        from .parallel import _parallel
+        return _parallel(factory, match, combine, attr, workers or os.cpu_count() or 1, chunkSize)
+
+    def stackless(self, exp):
+        from .compiler import Compiler
+        return Compiler(self, True).compile(self.optimize(exp))
+
+    def save(self, exp, path, stackless=False):
+        from .cache import _save
+        return _save(self, exp, path, stackless)
+
+    def incremental(self, exp):
+        from .incremental import Incremental
+        return Incremental(self, exp)
+
+    def memoStats(self):
+        if self._memoTable is None:
+            return {}
+        return dict((name, dict(counter)) for name, counter in self._memoTable.stats.items())
 
     def letrec(self, *args):
-        funcg = lambda g: g(g)
-        def funcp(p):
-            res = []
-            for arg in args:
-                def tmpfunc(arg):
-                    def inner(match, lastIndex, attr):
-                        return (self.wrap(arg(*p(p))))(match, lastIndex, attr)
-                    return inner
-                res.append(tmpfunc(arg))
-            return res
-        res = funcg(funcp)
-        return res[0]
+        names = [getattr(arg, "__name__", "<lambda>") for arg in args]
+        rules = [Rule("rule" + str(index) if name == "<lambda>" else name) for index, name in enumerate(names)]
+        for rule, arg in zip(rules, args):
+            exp = self.wrap(arg(*rules))
+            exp = self.memo(exp, rule.name) if self._memoRules else exp
+            rule.exp = self.name(rule.name, exp)
+        return rules[0]
+
+def load(path):
+    from .cache import _load
+    return _load(path)
 
+def cached(factory, directory, key=None, stackless=False):
+    from .cache import _cached
+    return _cached(factory, directory, key, stackless)
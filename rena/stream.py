@@ -0,0 +1,367 @@
+#
+# rena-python
+#
+# Copyright (c) 2019 Yuichiro MORIGUCHI
+#
+# This software is released under the MIT License.
+# http://opensource.org/licenses/mit-license.php
+#
+from .rena import _sre, _regexFirst, _tablePatterns, _fields, _MemoTable, ParseError, Rena, Node, Literal, Regex, \
+    Real, EqualsId, End, Memo, Rule, RealTable
+
+_more = object()
+_end = object()
+_widths = {}
+_prefixes = {}
+
+def _assertWidth(items):
+    width = 0
+    for op, av in items:
+        if op is _sre.ASSERT or op is _sre.ASSERT_NOT:
+            if av[0] > 0:
+                width = max(width, av[1].getwidth()[1] + _assertWidth(av[1]))
+        elif op is _sre.AT:
+            if av not in (_sre.AT_BEGINNING, _sre.AT_BEGINNING_LINE, _sre.AT_BEGINNING_STRING):
+                width = max(width, 1)
+        elif op is _sre.SUBPATTERN:
+            width = max(width, _assertWidth(av[3]))
+        elif op is _sre.BRANCH:
+            width = max([width] + [_assertWidth(branch) for branch in av[1]])
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", None)):
+            width = max(width, _assertWidth(av[2]))
+        elif op is getattr(_sre, "ATOMIC_GROUP", None):
+            width = max(width, _assertWidth(av))
+        elif op is _sre.GROUPREF_EXISTS:
+            width = max(width, _assertWidth(av[1]), _assertWidth(av[2]) if av[2] is not None else 0)
+    return width
+
+def _behindWidth(items, flags):
+    width = 0
+    for op, av in items:
+        if op is _sre.AT:
+            if av is _sre.AT_BEGINNING_STRING or (av is _sre.AT_BEGINNING and not flags & _sre.SRE_FLAG_MULTILINE):
+                return _sre.MAXREPEAT
+            elif av in (_sre.AT_BEGINNING, _sre.AT_BOUNDARY, _sre.AT_NON_BOUNDARY):
+                width = max(width, 1)
+        elif op is _sre.ASSERT or op is _sre.ASSERT_NOT:
+            width = max(width, _behindWidth(av[1], flags) + (av[1].getwidth()[1] if av[0] < 0 else 0))
+        elif op is _sre.SUBPATTERN:
+            width = max(width, _behindWidth(av[3], flags))
+        elif op is _sre.BRANCH:
+            width = max([width] + [_behindWidth(branch, flags) for branch in av[1]])
+        elif op in (_sre.MAX_REPEAT, _sre.MIN_REPEAT, getattr(_sre, "POSSESSIVE_REPEAT", None)):
+            width = max(width, _behindWidth(av[2], flags))
+        elif op is getattr(_sre, "ATOMIC_GROUP", None):
+            width = max(width, _behindWidth(av, flags))
+        elif op is _sre.GROUPREF_EXISTS:
+            width = max(width, _behindWidth(av[1], flags), _behindWidth(av[2], flags) if av[2] is not None else 0)
+    return width
+
+def _regexWidth(pattern):
+    if pattern not in _widths:
+        try:
+            parsed = _sre.parse(pattern.pattern, pattern.flags)
+            width, ahead, behind = parsed.getwidth()[1], _assertWidth(parsed), _behindWidth(parsed, pattern.flags)
+        except Exception:
+            width, ahead, behind = _sre.MAXREPEAT, _sre.MAXREPEAT, _sre.MAXREPEAT
+        _widths[pattern] = (None if width >= _sre.MAXREPEAT else width, None if ahead >= _sre.MAXREPEAT else ahead,
+            _regexFirst(pattern), None if behind >= _sre.MAXREPEAT else behind)
+    return _widths[pattern]
+
+def _alternatives(items, flags):
+    results = [()]
+    for op, av in items:
+        if op is _sre.LITERAL:
+            step = [(None if flags & _sre.SRE_FLAG_IGNORECASE else av,)]
+        elif op in (_sre.NOT_LITERAL, _sre.IN, _sre.ANY):
+            step = [(None,)]
+        elif op is _sre.AT:
+            continue
+        elif op is _sre.SUBPATTERN:
+            step = _alternatives(av[3], (flags | av[1]) & ~av[2])
+        elif op is _sre.BRANCH:
+            step = []
+            for branch in av[1]:
+                alternatives = _alternatives(branch, flags)
+                if alternatives is None:
+                    return None
+                step.extend(alternatives)
+        else:
+            return None
+        if step is None or len(results) * len(step) > 64:
+            return None
+        results = [result + item for result in results for item in step]
+    return results
+
+def _regexPrefixes(pattern):
+    if pattern not in _prefixes:
+        try:
+            alternatives = _alternatives(_sre.parse(pattern.pattern, pattern.flags), pattern.flags)
+        except Exception:
+            alternatives = None
+        _prefixes[pattern] = alternatives
+    return _prefixes[pattern]
+
+def _canGrow(pattern, match, lastIndex, end):
+    alternatives = _regexPrefixes(pattern)
+    if alternatives is None:
+        return True
+    text = match[lastIndex:end]
+    codes = list(text) if isinstance(text, (bytes, bytearray)) else [ord(ch) for ch in text]
+    for alternative in alternatives:
+        if len(alternative) > len(codes) and \
+                all(code is None or code == actual for code, actual in zip(alternative, codes)):
+            return True
+    return False
+
+class _Reach(Node):
+    __slots__ = ("tracker", "exp")
+
+    def __init__(self, tracker, exp):
+        self.tracker = tracker
+        self.exp = exp
+
+    def __call__(self, match, lastIndex, attr):
+        try:
+            result = self.exp(match, lastIndex, attr)
+        except ParseError as error:
+            self.tracker.error(self.exp, match, error)
+            raise
+        self.tracker.leaf(self.exp, match, lastIndex, result)
+        return result
+
+class _ReachMemo(Memo):
+    __slots__ = ("tracker",)
+
+    def __call__(self, match, lastIndex, attr):
+        tracker = self.tracker
+        key = (self.memoId, lastIndex, id(attr))
+        entry = self.table.lookup(match, key, attr)
+        if entry is None:
+            self.counter["misses"] += 1
+            reach = tracker.reach
+            tracker.reach = 0
+            self.table.depth += 1
+            try:
+                entry = (self.exp(match, lastIndex, attr), tracker.reach)
+            finally:
+                self.table.depth -= 1
+            self.table.store(key, attr, entry)
+            tracker.reach = reach
+        else:
+            self.counter["hits"] += 1
+        tracker.touch(entry[1])
+        return entry[0]
+
+class _TrackedRena(Rena):
+    def __init__(self, rena, tracker):
+        self.__dict__.update(rena.__dict__)
+        if rena._memoTable is not None:
+            self._memoTable = tracker.table(rena._memoTable)
+        self._tracker = tracker
+        self._trackedIgnore = None
+
+    def _ignore(self, match, lastIndex):
+        if self._ignoreExp is None:
+            return lastIndex
+        elif self._ignorePattern is not None:
+            result = self._ignorePattern.match(match, lastIndex)
+            self._tracker.regex(self._ignorePattern, match, lastIndex, None if result is None else result.end())
+            return lastIndex if result is None else result.end()
+        if self._trackedIgnore is None:
+            self._trackedIgnore = self._tracker.track(self._ignoreExp)
+        matched, indexNew, attrNew = self._trackedIgnore(match, lastIndex, 0)
+        return lastIndex if matched is None else indexNew
+
+    def _findKey(self, match, lastIndex):
+        if self._keyPattern is not None:
+            result = self._keyPattern.match(match, lastIndex)
+            self._tracker.regex(self._keyPattern, match, lastIndex, None if result is None else result.end())
+        return Rena._findKey(self, match, lastIndex)
+
+class _Tracker:
+    def __init__(self):
+        self.reach = 0
+        self.low = 0
+        self.renas = {}
+        self.tables = {}
+        self.done = {}
+
+    def touch(self, reach):
+        if reach > self.reach:
+            self.reach = reach
+
+    def back(self, low):
+        if low < self.low:
+            self.low = low
+
+    def regex(self, pattern, match, lastIndex, end):
+        width, ahead, first, behind = _regexWidth(pattern)
+        if behind != 0:
+            self.back(0 if behind is None else lastIndex - behind)
+        if ahead is None:
+            self.touch(len(match) + 1)
+        elif end is not None and (width is not None and end - lastIndex >= width or
+                not _canGrow(pattern, match, lastIndex, end)):
+            self.touch(end + ahead)
+        elif width is not None:
+            self.touch(lastIndex + width + ahead + 1)
+        elif end is not None:
+            self.touch(end + ahead + 1)
+        elif first is not None and lastIndex < len(match) and match[lastIndex] not in first:
+            self.touch(lastIndex + 1)
+        else:
+            self.touch(len(match) + 1)
+
+    def leaf(self, exp, match, lastIndex, result):
+        kind = type(exp)
+        if kind is Literal:
+            string = exp.string
+            if result[0] is not None:
+                self.touch(lastIndex + len(string))
+                return
+            length = 0
+            while length < len(string) and lastIndex + length < len(match) \
+                    and match[lastIndex + length] == string[length]:
+                length += 1
+            self.touch(lastIndex + length + 1)
+        elif kind is Real:
+            if result[0] is not None:
+                self.touch(result[1] + 3)
+            else:
+                self.regex(exp.pattern, match, lastIndex, None)
+        elif kind is Regex:
+            self.regex(exp.pattern, match, lastIndex, result[1])
+        elif kind is End:
+            self.touch(lastIndex + 1)
+        elif kind is RealTable:
+            if result[0] is not None:
+                self.touch(result[1])
+            self.regex(_tablePatterns(exp.separator).row, match, lastIndex if result[0] is None else result[1], None)
+        elif kind is EqualsId:
+            if result[1] == len(match):
+                self.touch(len(match) + 1)
+        else:
+            self.touch(lastIndex + 1 if result[1] is None else result[1] + 1)
+
+    def error(self, exp, match, error):
+        newline = _tablePatterns(exp.separator).newline.search(match, error.index) if type(exp) is RealTable else None
+        self.touch(len(match) + 1 if newline is None else newline.end() + 1)
+
+    def rena(self, rena):
+        if id(rena) not in self.renas:
+            self.renas[id(rena)] = (rena, _TrackedRena(rena, self))
+        return self.renas[id(rena)][1]
+
+    def table(self, table):
+        if id(table) not in self.tables:
+            self.tables[id(table)] = (table, _MemoTable(table.size, table.eviction, table.window))
+        return self.tables[id(table)][1]
+
+    def rule(self, rule, exp):
+        return exp
+
+    def memo(self, memo, exp):
+        result = _ReachMemo(self.table(memo.table), memo.memoId, memo.counter, exp)
+        result.tracker = self
+        return result
+
+    def track(self, exp):
+        if id(exp) in self.done:
+            return self.done[id(exp)][1]
+        kind = type(exp)
+        if not isinstance(exp, Node) or kind in (Literal, Regex, Real, End, RealTable):
+            result = _Reach(self, exp)
+        elif kind is Rule:
+            result = Rule(exp.name)
+            self.done[id(exp)] = (exp, result)
+            result.exp = self.rule(exp, self.track(exp.exp))
+            return result
+        elif kind is Memo:
+            result = self.memo(exp, self.track(exp.exp))
+        else:
+            result = object.__new__(kind)
+            for name in _fields(kind):
+                value = getattr(exp, name)
+                if name == "rena":
+                    value = self.rena(value)
+                elif name == "exp" or name == "delimiter":
+                    value = self.track(value)
+                elif name == "exps":
+                    value = tuple(self.track(child) for child in value)
+                elif name == "dispatch":
+                    value = None
+                setattr(result, name, value)
+            if kind is EqualsId:
+                result = _Reach(self, result)
+        self.done[id(exp)] = (exp, result)
+        return result
+
+class _Stream:
+    def __init__(self, tracker, exp, attr):
+        self.tracker = tracker
+        self.exp = exp
+        self.attr = attr
+        self.buffer = None
+        self.index = 0
+        self.offset = 0
+        self.eof = False
+
+    def feed(self, data):
+        if self.buffer is None:
+            self.buffer = data
+        else:
+            self.offset += self.index
+            self.buffer = self.buffer[self.index:] + data
+            self.index = 0
+
+    def close(self):
+        self.eof = True
+
+    def pending(self):
+        return 0 if self.buffer is None else len(self.buffer) - self.index
+
+    def parse(self):
+        buffer = self.buffer
+        if buffer is None or self.index == len(buffer):
+            return _end if self.eof else _more
+        self.tracker.reach = 0
+        try:
+            matched, indexNew, attrNew = self.exp(buffer, self.index, self.attr)
+        except ParseError as error:
+            if not self.eof and self.tracker.reach > len(buffer):
+                return _more
+            raise ParseError(error.message, self.offset + error.index)
+        if not self.eof and self.tracker.reach > len(buffer):
+            return _more
+        elif matched is None:
+            raise ParseError("record does not match", self.offset + self.index)
+        elif indexNew == self.index:
+            raise ParseError("record matches empty string", self.offset + self.index)
+        self.index = indexNew
+        return attrNew
+
+def _iterparse(rena, exp, fileobj, chunkSize, attr):
+    tracker = _Tracker()
+    stream = _Stream(tracker, tracker.track(rena.wrap(exp)), attr)
+    chunks = None if hasattr(fileobj, "read") else iter(fileobj)
+    size = chunkSize
+    while True:
+        result = stream.parse()
+        if result is _end:
+            return
+        elif result is not _more:
+            size = chunkSize
+            yield result
+            continue
+        if chunks is None:
+            data = fileobj.read(size)
+            eof = not data
+        else:
+            data = next(chunks, None)
+            eof = data is None
+        if eof:
+            stream.close()
+        elif data:
+            stream.feed(data)
+            size = max(chunkSize, stream.pending())
@@ -6,8 +6,36 @@
 # This software is released under the MIT License.
 # http://opensource.org/licenses/mit-license.php
 #
+import asyncio
+import functools
+import io
+import mmap
+import operator
+import os
+import tempfile
 import unittest
 from rena import *
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def sumLines():
+    r = rena.Rena()
+    record = r.then(r.attr(0), r.delimit(r.action(r.real(), lambda m, s, i: i + s), ","))
+    return (record, r.br())
+
+sumScale = 2
+
+def scaledNumber(r):
+    scale = sumScale
+    return r.action(r.real(), lambda m, s, i: s * scale)
+
+def scaledSum():
+    r = rena.Rena({ "ignore": rena.Rena().re("[ ]+"), "memo": True })
+    def item(item):
+        return r.choice(r.then("(", r.attr(0), r.zeroOrMore(r.action(item, lambda m, s, i: i + s)), ")"), scaledNumber(r))
+    return (r, r.letrec(item))
 
 class TestRena(unittest.TestCase):
     def match(self, ptn, string, index):
@@ -177,6 +205,16 @@ class TestRena(unittest.TestCase):
         self.nomatch(r.key("++"), "+++")
         self.nomatch(r.key("++"), "+")
 
+    def test_key_empty(self):
+        for option in ({ "keys": [ "++", "-" ] }, { "keys": [ "++" ], "bytes": True }, {}):
+            r = rena.Rena(option)
+            encode = (lambda text: text.encode()) if "bytes" in option else (lambda text: text)
+            for compile in (lambda exp: exp, r.compile):
+                self.match(compile(r.then("a", r.key(""), "b")), encode("ab"), 2)
+                self.match(compile(r.key("")), encode("+"), 0)
+                if option:
+                    self.nomatch(compile(r.key("")), encode("++"))
+
     def test_notKey(self):
         r = rena.Rena({ "keys": [ "++", "+++", "-" ] })
         self.match(r.notKey(), "+", 0)
@@ -185,6 +223,20 @@ class TestRena(unittest.TestCase):
         self.nomatch(r.notKey(), "-")
         self.nomatch(r.notKey(), "+++")
 
+    def test_key_longest(self):
+        r = rena.Rena({ "keys": [ "+", "+++", "-", "->" ] })
+        self.match(r.key("+++"), "++++", 3)
+        self.nomatch(r.key("+"), "++")
+        self.match(r.key("->"), "->", 2)
+        self.match(r.key("-"), "-x", 1)
+        self.nomatch(r.notKey(), "-x")
+        self.match(r.notKey(), "++", 0)
+        keys = [ "k" + str(i) for i in range(300) ]
+        r = rena.Rena({ "keys": keys })
+        self.match(r.zeroOrMore(r.choice(*[r.key(key) for key in reversed(keys)])), "k1k299k30k3", 11)
+        r = rena.Rena({ "keys": [] })
+        self.nomatch(r.equalsId("key"), "key+")
+
     def test_equalsId1(self):
         r = rena.Rena()
         self.match(r.equalsId("key"), "key", 3)
@@ -256,6 +308,598 @@ class TestRena(unittest.TestCase):
         self.match(a, "(()))", 4)
         self.nomatch(a, "((())")
 
+    def test_letrec_once(self):
+        r = rena.Rena()
+        count = [0]
+        def paren(paren):
+            count[0] += 1
+            return r.then("(", r.maybe(paren), ")")
+        a = r.letrec(paren)
+        self.match(a, "((((()))))", 10)
+        self.match(a, "()", 2)
+        self.assertEqual(1, count[0])
+
+    def test_letrec_mutual(self):
+        r = rena.Rena()
+        a = r.letrec(lambda a, b: r.choice(r.then("a", b), "a"), lambda a, b: r.then("b", a))
+        self.match(a, "ababa", 5)
+        self.match(a, "abab", 3)
+
+    def test_node(self):
+        r = rena.Rena()
+        a = r.then("765", r.choice(r.re("[a-z]+"), r.real()))
+        self.assertIsInstance(a, rena.Seq)
+        self.assertIsInstance(a.exps[0], rena.Literal)
+        self.assertIsInstance(a.exps[1], rena.Choice)
+        self.assertTrue(repr(a).startswith("Seq((Literal('765'), Choice((Regex(re.compile('[a-z]+')), Real(re.compile("))
+        self.assertFalse(hasattr(a, "__dict__"))
+        paren = r.letrec(lambda paren: r.then("(", r.maybe(paren), ")"))
+        self.assertIsInstance(paren, rena.Rule)
+        self.assertIs(paren, paren.exp.exps[1].exp)
+
+    def test_optimize(self):
+        r = rena.Rena({ "fuse": False })
+        a = r.optimize(r.then("7", r.then("6", "5"), r.re("[a-z]+"), r.then("3", "4"), r.choice(r.choice("a", "b"), "c")))
+        self.assertEqual(["765", "34"], [exp.string for exp in a.exps if isinstance(exp, rena.Literal)])
+        self.assertEqual(4, len(a.exps))
+        self.assertEqual(3, len(a.exps[3].exps))
+        self.assertEqual(("765abc34b", 9, 0), a("765abc34b", 0, 0))
+        r = rena.Rena({ "ignore": " ", "fuse": False })
+        a = r.optimize(r.then("7", r.then("6", "5")))
+        self.assertEqual(2, len(a.exps))
+        self.assertEqual(("7 65 ", 5, 0), a("7 65 ", 0, 0))
+        paren = r.optimize(r.letrec(lambda paren: r.then("(", r.maybe(paren), ")")))
+        self.match(paren, "(( ))", 5)
+
+    def assertFused(self, r, ptn, strings, init=0):
+        fused = r.optimize(ptn)
+        for string in strings:
+            self.assertEqual(ptn(string, 0, init), fused(string, 0, init))
+        return fused
+
+    def test_fuse(self):
+        r = rena.Rena()
+        a = self.assertFused(r, r.then(r.choice("ab", "a"), "b"), ["ab", "abb", "a"])
+        self.assertIsInstance(a, rena.Regex)
+        self.assertFused(r, r.then(r.zeroOrMore("a"), "a"), ["aaa", "a", ""])
+        self.assertFused(r, r.times(2, 3, r.re("[0-9]")), ["1", "12", "1234"])
+        self.assertFused(r, r.delimit(r.re("[a-z]"), ","), ["a", "a,b,c", "a,b,", ",", ""])
+        self.assertFused(r, r.then("765", r.lookahead("pro"), r.lookaheadNot("x")), ["765pro", "765pr", "765x"])
+        self.assertFused(r, r.then("765", r.end()), ["765", "765aaa"])
+        self.assertFused(r, r.choice(r.re("(a)"), r.re("(?i)b")), ["a", "B"])
+        b = self.assertFused(r, r.then(r.re("[a-z]+"), "=", r.real(), ";", r.re("[a-z]+")), ["a=1;b", "a=1;", "a=x;b"])
+        self.assertEqual(3, len(b.exps))
+        self.assertIsInstance(b.exps[0], rena.Regex)
+        c = self.assertFused(r, r.choice("if", "else", r.attr(1), "then", "do"), ["if", "else", "x", "then"])
+        self.assertEqual(3, len(c.exps))
+
+    def test_fuse_ignore(self):
+        r = rena.Rena({ "ignore": rena.Rena().re(r"\s+") })
+        self.assertFused(r, r.then("765", "pro"), ["765pro", "765 pro ", "765 pr"])
+        self.assertFused(r, r.times(2, 4, "a"), ["a a a ", "a", "aaaaa"])
+        self.assertFused(r, r.delimit(r.re("[a-z]"), ","), ["a , a ,", ",", "a,a"])
+        self.assertFused(r, r.then("a", r.real(), "b", "c"), ["a 1 b c", "a 1 bc "])
+        s = rena.Rena({ "ignore": r.real() })
+        self.assertIsInstance(s.optimize(s.then("a", "b")), rena.Seq)
+
+    def test_fuse_disabled(self):
+        r = rena.Rena({ "fuse": False })
+        self.assertIsInstance(r.optimize(r.then("a", r.re("b"))), rena.Seq)
+
+    def test_choice_dispatch(self):
+        r = rena.Rena()
+        a = r.choice(r.memo("if", "a"), r.then("e", "lse"), r.re("[0-9]+"), r.memo(r.lookaheadNot("x"), "b"), r.re("[a-z]+"))
+        self.assertEqual(("else", 4, 0), a("else", 0, 0))
+        self.assertEqual(("765", 3, 0), a("765", 0, 0))
+        self.assertEqual(("", 0, 0), a("when", 0, 0))
+        self.assertEqual(("x", 1, 0), a("x", 0, 0))
+        self.assertEqual(("", 0, 0), a("", 0, 0))
+        self.assertEqual(("if", 2, 0), a("if", 0, 0))
+        self.assertEqual(1, r.memoStats()["a"]["misses"])
+        self.assertEqual(3, r.memoStats()["b"]["misses"])
+        self.assertEqual(("ifx", 3, 0), r.choice(r.re("if[a-z]"), "if")("ifx", 0, 0))
+        self.assertEqual(("if", 2, 0), r.choice(r.re("if[a-z]"), "if")("if!", 0, 0))
+        b = r.choice(r.re("(?:a|b)c+|x*"), r.re("[d-f]+"), r.re("d"))
+        self.assertEqual(("acc", 3, 0), b("acc", 0, 0))
+        self.assertEqual(("", 0, 0), b("ee", 0, 0))
+        self.assertEqual(("ee", 2, 0), r.choice(r.re("(?:a|b)c+|x"), r.re("[d-f]+"))("ee", 0, 0))
+        self.assertEqual(("", 0, 0), b("ad", 0, 0))
+
+    def assertCompiled(self, r, ptn, strings, init=0):
+        compiled = r.compile(ptn)
+        for string in strings:
+            self.assertEqual(ptn(string, 0, init), compiled(string, 0, init))
+
+    def test_compile(self):
+        r = rena.Rena()
+        self.assertCompiled(r, r.wrap("765"), ["765", "961", ""])
+        self.assertCompiled(r, r.then("765", r.re("p[a-z]+")), ["765pro", "765", "765ab"])
+        self.assertCompiled(r, r.choice("765", "346", r.then("3", "15")), ["765", "346", "315", "961"])
+        self.assertCompiled(r, r.times(2, 4, "a"), ["a", "aa", "aaaaa"])
+        self.assertCompiled(r, r.times(2, 4, r.re("[a-z]"), lambda m, s, i: m + i), ["abc", "abcde", "a"], "")
+        self.assertCompiled(r, r.atLeast(2, "a"), ["a", "aaaaa"])
+        self.assertCompiled(r, r.maybe(r.then("a", "b")), ["ab", "aab", ""])
+        self.assertCompiled(r, r.delimit(r.real(), "+", lambda m, s, i: i + s), ["765+1+2", "765+", "+"])
+        self.assertCompiled(r, r.then("765", r.lookahead("pro")), ["765pro", "765pr"])
+        self.assertCompiled(r, r.then("765", r.lookaheadNot("aaa")), ["765pro", "765aaa"])
+        self.assertCompiled(r, r.then(r.attr(27), r.cond(lambda a: a == 27), r.end()), ["", "a"])
+        self.assertCompiled(r, r.action("765", lambda m, s, a: a * a), ["765", "961"], 29)
+        self.assertCompiled(r, r.equalsId("key"), ["key", "keys", "key+"])
+        self.assertCompiled(r, r.choice("if", r.re("[0-9]+"), r.attr(1), r.key("x")), ["if", "12", "x", ""])
+
+    def test_compile_option(self):
+        r = rena.Rena({ "ignore": " ", "keys": [ "++", "+++", "-" ] })
+        self.assertCompiled(r, r.then("765", "pro"), ["765 pro ", "765pro"])
+        self.assertCompiled(r, r.times(2, 4, "a"), ["a a a ", "a"])
+        self.assertCompiled(r, r.delimit(r.re("[a-z]"), ","), ["a , a ,", ","])
+        self.assertCompiled(r, r.choice(r.key("++"), r.key("-"), r.notKey()), ["++", "+++", "-", "+"])
+        self.assertCompiled(r, r.equalsId("key"), ["key", "key ", "keys", "key++", "key+"])
+        plain = rena.Rena()
+        same = lambda exp: r.action(exp, lambda m, s, i: s)
+        self.assertCompiled(plain, plain.then(r.then(same("a"), same("b")), "c"), ["a b c", "a bc", "ab c"])
+        self.assertCompiled(plain, plain.then(r.times(1, 3, same("a")), r.delimit(same("b"), ","), "c"), ["a a b , bc"])
+        self.assertCompiled(plain, plain.then(r.equalsId("if"), same("x")), ["ifx", "if x", "if++x"])
+        self.assertCompiled(plain, plain.choice(r.key("++"), r.notKey()), ["++", "+", "-"])
+
+    def test_compile_letrec(self):
+        r = rena.Rena()
+        def term(term, factor, element):
+            return r.then(factor, r.zeroOrMore(r.choice(
+                r.action(r.then("+", factor), lambda m, s, i: i + s),
+                r.action(r.then("-", factor), lambda m, s, i: i - s))))
+        def factor(term, factor, element):
+            return r.then(element, r.zeroOrMore(r.choice(
+                r.action(r.then("*", element), lambda m, s, i: i * s),
+                r.action(r.then("/", element), lambda m, s, i: i / s))))
+        def element(term, factor, element):
+            return r.choice(r.real(), r.then("(", term, ")"))
+        expr = r.letrec(term, factor, element)
+        self.assertCompiled(r, expr, ["1+2*3", "4-6/2", "(4-6)/2", "((((1))))*(2+3", ""])
+        memo = rena.Rena({ "memo": True })
+        paren = memo.letrec(lambda paren: memo.then("(", memo.maybe(paren), ")"))
+        self.assertCompiled(memo, paren, ["((()))", "(()))", "((())"])
+
+    def test_ignore_cache(self):
+        count = [0]
+        s = rena.Rena()
+        space = s.re(" +")
+        def counted(match, lastIndex, attr):
+            count[0] += 1
+            return space(match, lastIndex, attr)
+        r = rena.Rena({ "ignore": counted })
+        a = r.choice(r.then("a", "b", "c"), r.then("a", "b", "d"), r.then("a", "b"))
+        self.match(a, "a  b  e", 6)
+        self.assertEqual(2, count[0])
+        self.match(a, "a b d", 5)
+        self.assertEqual(5, count[0])
+
+    def test_ignore_regex(self):
+        s = rena.Rena()
+        r = rena.Rena({ "ignore": s.re("[ \t]+") })
+        self.match(r.then("765", "pro"), "765 \t pro\t", 10)
+        self.match(r.equalsId("key"), "key \t", 5)
+        self.nomatch(r.equalsId("key"), "keys")
+
+    def test_spans(self):
+        def grammar(r):
+            word = r.action(r.re("[a-z]+"), lambda m, s, i: i + [m])
+            return r.then(r.attr([]), r.delimit(r.choice(word, r.key("++"), r.real()), ",", lambda m, s, i: s), r.lookaheadNot("!"), r.maybe(";"), r.end())
+        r = rena.Rena({ "keys": [ "++" ] })
+        t = rena.Rena({ "keys": [ "++" ], "spans": True })
+        a, b = grammar(r), grammar(t)
+        for string in [ "ab,cd,ef", "ab,++,ef;", "ab,1.5", "ab,cd!", "" ]:
+            expected = a(string, 0, 0)
+            self.assertEqual(expected[1:], b(string, 0, 0)[1:])
+            if expected[0] is not None:
+                span = b(string, 0, 0)[0]
+                self.assertEqual(expected[0], string[span[0]:span[1]])
+            self.assertEqual(b(string, 0, 0), t.compile(b)(string, 0, 0))
+        self.assertEqual(((0, 3), 3, 0), t.re("[a-z]+")("abc", 0, 0))
+        self.assertEqual(((1, 3), 3, 0), t.wrap("bc")("abc", 1, 0))
+        self.assertEqual(((0, 5), 5, "a,b,c"), t.delimit(t.re("[a-z]"), ",", lambda m, s, i: m if i == 0 else i + "," + m)("a,b,c.", 0, 0))
+
+    def test_memo(self):
+        r = rena.Rena()
+        count = [0]
+        def counted(match, lastIndex, attr):
+            count[0] += 1
+            return r.re("[a-z]+")(match, lastIndex, attr)
+        word = r.memo(counted, "word")
+        a = r.choice(r.then(word, "1"), r.then(word, "2"), r.then(word, "3"))
+        self.match(a, "abc3", 4)
+        self.assertEqual(1, count[0])
+        self.nomatch(a, "abc4")
+        self.assertEqual(2, count[0])
+        self.assertEqual({ "word": { "hits": 4, "misses": 2 } }, r.memoStats())
+
+    def test_memo_attr(self):
+        r = rena.Rena()
+        a = r.memo(r.action(r.re("[0-9]"), lambda m, s, i: i + int(m)))
+        self.assertEqual(("1", 1, 3), a("1", 0, 2))
+        self.assertEqual(("1", 1, 5), a("1", 0, 4))
+
+    def test_memo_eviction(self):
+        def grammar(r):
+            a = r.memo("a", "a")
+            return r.choice(r.then(a, a, a, "b"), r.then(a, a, a, "c"))
+        r = rena.Rena({ "memo": { "size": 3 } })
+        self.match(grammar(r), "aaac", 4)
+        self.assertEqual({ "hits": 3, "misses": 3 }, r.memoStats()["a"])
+        r = rena.Rena({ "memo": { "size": 2 } })
+        self.match(grammar(r), "aaac", 4)
+        self.assertEqual({ "hits": 0, "misses": 6 }, r.memoStats()["a"])
+        r = rena.Rena({ "memo": { "eviction": "window", "window": 0 } })
+        self.match(grammar(r), "aaac", 4)
+        self.assertEqual({ "hits": 1, "misses": 5 }, r.memoStats()["a"])
+
+    def test_memo_letrec(self):
+        r = rena.Rena({ "memo": True })
+        def paren(paren):
+            return r.choice(r.then("(", r.maybe(paren), ")", "a"), r.then("(", r.maybe(paren), ")"))
+        a = r.letrec(paren)
+        self.match(a, "(((((((((())))))))))", 20)
+        self.assertTrue(r.memoStats()["paren"]["hits"] > 0)
+        self.assertTrue(r.memoStats()["paren"]["misses"] <= 22)
+
+    def test_stackless(self):
+        r = rena.Rena()
+        def term(term, factor, element):
+            return r.then(factor, r.zeroOrMore(r.choice(
+                r.action(r.then("+", factor), lambda m, s, i: i + s),
+                r.action(r.then("-", factor), lambda m, s, i: i - s))))
+        def factor(term, factor, element):
+            return r.then(element, r.zeroOrMore(r.choice(
+                r.action(r.then("*", element), lambda m, s, i: i * s),
+                r.action(r.then("/", element), lambda m, s, i: i / s))))
+        def element(term, factor, element):
+            return r.choice(r.real(), r.then("(", term, ")"))
+        expr = r.letrec(term, factor, element)
+        machine = r.stackless(expr)
+        for string in ["1+2*3", "4-6/2", "(4-6)/2", "((((1))))*(2+3", ""]:
+            self.assertEqual(expr(string, 0, 0), machine(string, 0, 0))
+        self.assertEqual((None, None, None), r.stackless("765")("961", 0, 0))
+        deep = "(" * 20000 + "1" + ")" * 20000
+        self.assertEqual(40001, machine(deep, 0, 0)[1])
+        memo = rena.Rena({ "memo": True })
+        def paren(paren):
+            return memo.choice(memo.then("(", paren, ")", "a"), memo.then("(", memo.maybe(paren), ")"))
+        paren = memo.letrec(paren)
+        for string in ["((()))a", "(()))", "((())"]:
+            self.assertEqual(paren(string, 0, 0), memo.stackless(paren)(string, 0, 0))
+        self.assertTrue(memo.memoStats()["paren"]["hits"] > 0)
+
+    def test_cut(self):
+        r = rena.Rena({ "ignore": rena.Rena().re("[ ]+"), "memo": True })
+        def stmt(stmt):
+            return r.choice(r.then(r.equalsId("if"), r.cut(), r.re("[a-z]+"), "then", stmt), r.then(r.re("[a-z]+"), ";"))
+        stmt = r.letrec(stmt)
+        for exp in [stmt, r.compile(stmt), r.stackless(stmt)]:
+            self.match(exp, "if a then b;", 12)
+            self.match(exp, "iffy;", 5)
+            with self.assertRaises(rena.ParseError) as error:
+                exp("if a else b;", 0, 0)
+            self.assertEqual(3, error.exception.index)
+        with self.assertRaises(rena.ParseError):
+            r.choice(r.commit("a"), "b")("b", 0, 0)
+        spaced = rena.Rena({ "ignore": " " })
+        for exp, index in [(spaced.then("a", spaced.cut(), "b"), 4), (spaced.then("a", spaced.commit("b", "c")), 6),
+                (spaced.then("a", spaced.cut(), "b", spaced.cut(), "c"), 6)]:
+            for compiled in [exp, spaced.compile(exp), spaced.stackless(exp)]:
+                self.match(compiled, "a b  " if index == 4 else "a b c  ", index)
+        self.match(stmt, "if a then if b then c;", 22)
+        self.assertTrue(all(key[1] >= 20 for key in r._memoTable.entries))
+        record = r.then(r.action(r.re("[a-z]+"), lambda m, s, i: m), r.cut(), ";")
+        self.assertEqual(["a", "b"], list(r.iterparse(record, ["a", ";b", ";"])))
+        with self.assertRaises(rena.ParseError) as error:
+            list(r.iterparse(record, ["a;b", "c"]))
+        self.assertEqual(4, error.exception.index)
+        word = r.then(r.action(r.memo(r.re("[a-z]+"), "word"), lambda m, s, i: m), r.cut(), ";")
+        records = r.iterparse(word, ["ab;" * 1000])
+        self.assertEqual(["ab"] * 900, [next(records) for count in range(900)])
+        tables = records.gi_frame.f_locals["tracker"].tables.values()
+        self.assertEqual([0], [len(table.entries) for original, table in tables])
+
+    def test_collect(self):
+        r = rena.Rena({ "ignore": rena.Rena().re("[ ]+") })
+        pair = r.then(r.action(r.re("[a-z]+"), lambda m, s, i: m), ":", r.action(r.real(), lambda m, s, i: (i, s)))
+        cases = [
+            (r.zeroOrMore(r.real(), r.collect("list")), "1 2 3", [1.0, 2.0, 3.0]),
+            (r.oneOrMore(r.re("[a-z]+"), r.collect("join", ",")), "ab cd", "ab,cd"),
+            (r.times(1, 2, r.real(), r.collect("sum")), "1 2 3", 3.0),
+            (r.zeroOrMore(r.real(), r.collect("count")), "", 0),
+            (r.delimit(pair, ",", r.collect("dict")), "a:1, b:2", { "a": 1.0, "b": 2.0 }),
+            (r.delimit(r.re("[a-z]+"), ",", r.collect("join", "-")), "a,b", "a-b"),
+            (r.delimit(r.real(), ",", r.collect("count")), "1,2,3", 3)
+        ]
+        for exp, string, attr in cases:
+            for compiled in (exp, r.compile(exp), r.stackless(exp)):
+                self.assertEqual(attr, compiled(string, 0, None)[2])
+        exp = r.zeroOrMore(r.real(), r.collect("list"))
+        self.assertIsNot(exp("1", 0, None)[2], exp("1", 0, None)[2])
+        self.nomatch(r.delimit(r.real(), ",", r.collect("list")), "a")
+        with self.assertRaises(ValueError):
+            r.collect("set")
+
+    def test_realTable(self):
+        r = rena.Rena()
+        table = r.realTable()
+        self.match(table, "1,2.5,-3\n4,5e1,.5\nend", 18)
+        self.assertEqual([[1.0, 2.5, -3.0], [4.0, 50.0, 0.5]], table("1,2.5,-3\r\n4,5e1,.5", 0, 0)[2].tolist())
+        self.assertEqual(2048, len(r.compile(table)("1,2\n" * 2048, 0, 0)[2]))
+        self.nomatch(table, "end")
+        with self.assertRaises(rena.ParseError) as error:
+            table("1,2\n3,4,5\n", 0, 0)
+        self.assertEqual(("row has 3 columns instead of 2", 4), (error.exception.message, error.exception.index))
+        with self.assertRaises(rena.ParseError) as error:
+            table("1,2\n3,x\n", 0, 0)
+        self.assertEqual(("malformed row", 5), (error.exception.message, error.exception.index))
+        data = rena.Rena({ "bytes": True }).realTable(";", action=lambda m, s, i: i + [s.tolist()])
+        self.assertEqual([[[1.0, 2.0]]], data(memoryview(b"1;2\n"), 0, [])[2])
+        record = r.then(r.realTable(), ";", r.br())
+        self.assertEqual([[[1.0, 2.0], [3.0, 4.0]], [[5.0]]],
+            [table.tolist() for table in r.iterparse(record, ["1,", "2\n3", ",4\n;", "\n5\n;\n"])])
+
+    @unittest.skipIf(numpy is None, "numpy is not installed")
+    def test_realTable_numpy(self):
+        table = rena.Rena().realTable(",", numpy=True)("1,2\n3,4\n", 0, 0)[2]
+        self.assertEqual((2, 2), table.shape)
+        self.assertEqual(4.0, table[1, 1])
+
+    def test_bytes(self):
+        r = rena.Rena({ "bytes": True, "ignore": rena.Rena({ "bytes": True }).re("[ \t]+"), "keys": ["+", "++"] })
+        expr = r.delimit(r.real(), r.key("+"), lambda m, s, i: s + i)
+        data = b"1 + 2.5 +\t3"
+        with tempfile.TemporaryFile() as f:
+            f.write(data)
+            f.flush()
+            mapped = mmap.mmap(f.fileno(), 0)
+            for match in (data, bytearray(data), memoryview(data), mapped):
+                self.assertEqual((11, 6.5), expr(match, 0, 0)[1:])
+                self.assertEqual((11, 6.5), r.compile(expr)(match, 0, 0)[1:])
+            mapped.close()
+        self.match(r.then("ab", r.re("[0-9]+")), memoryview(b"ab 12"), 5)
+        self.matchAttr(r.key("++"), b"++", 2, 0)
+        self.nomatch(r.key("+"), b"++")
+        self.nomatch(r.notKey(), b"+")
+        self.assertEqual([[1.0, 2.0], [3.0]], list(r.iterparse(
+            r.then(r.attr([]), r.delimit(r.action(r.real(), lambda m, s, i: i + [s]), ","), r.br()),
+            io.BytesIO(b"1,2\n3\n"), 1)))
+
+    def test_bytes_mutable(self):
+        r = rena.Rena({ "bytes": True, "memo": True })
+        word = r.memo(r.re("[a-z]+;?"))
+        ignoring = rena.Rena({ "bytes": True, "ignore": lambda match, lastIndex, attr: (None, None, None)
+            if match[lastIndex:lastIndex + 1] != b"x" else (b"x", lastIndex + 1, attr), "keys": ["+"] })
+        pair = ignoring.then("a", "b")
+        for compile in (lambda exp: exp, r.compile, r.stackless):
+            buffer = bytearray(b"abc;")
+            self.assertEqual(4, compile(word)(buffer, 0, 0)[1])
+            buffer[:] = b"ab;;"
+            self.assertEqual(3, compile(word)(buffer, 0, 0)[1])
+            buffer[:] = b"axb"
+            self.assertEqual(3, compile(pair)(buffer, 0, 0)[1])
+            buffer[:] = b"ayb"
+            self.assertIsNone(compile(pair)(buffer, 0, 0)[0])
+            buffer[:] = b"+"
+            self.assertIsNotNone(compile(ignoring.key("+"))(buffer, 0, 0)[0])
+            buffer[:] = b"-"
+            self.assertIsNone(compile(ignoring.key("+"))(buffer, 0, 0)[0])
+
+    def test_profile(self):
+        r = rena.Rena({ "profile": True })
+        word = r.name("word", r.re("[a-z]+"))
+        stmt = r.name("stmt", r.choice(r.then(word, "="), r.then(word, "(")))
+        self.match(stmt, "abc(", 4)
+        stats = r.profileStats()
+        self.assertEqual({ "calls": 2, "successes": 2, "failures": 0, "positions": 1, "repeats": 1 },
+            dict((name, stats["word"][name]) for name in ("calls", "successes", "failures", "positions", "repeats")))
+        self.assertEqual((1, 1, 0), (stats["stmt"]["calls"], stats["stmt"]["successes"], stats["stmt"]["failures"]))
+        self.assertTrue(stats["stmt"]["time"] >= stats["word"]["time"])
+        self.assertTrue(stats["stmt"]["time"] >= stats["stmt"]["selfTime"])
+        self.nomatch(r.compile(stmt), "123")
+        self.assertEqual(2, r.profileStats()["stmt"]["calls"])
+        self.assertEqual(1, r.profileStats()["stmt"]["failures"])
+        self.assertEqual(["name", "stmt", "word"], [line.split()[0] for line in r.profileReport("failures").split("\n")])
+        plain = rena.Rena()
+        word = plain.re("[a-z]+")
+        self.assertIs(word, plain.name("word", word))
+        self.assertEqual({}, plain.profileStats())
+
+    def test_profile_cut(self):
+        r = rena.Rena({ "profile": True })
+        stmt = r.name("stmt", r.then("if", r.cut(), r.name("cond", r.re("[a-z]+")), ";"))
+        for exp in (stmt, r.compile(stmt), r.stackless(stmt)):
+            with self.assertRaises(rena.ParseError):
+                exp("if 1;", 0, 0)
+            self.assertEqual([], r._profileStack)
+        self.assertEqual(3, r.profileStats()["stmt"]["failures"])
+        self.assertEqual(3, r.profileStats()["cond"]["failures"])
+
+    def test_profile_letrec(self):
+        r = rena.Rena({ "profile": True })
+        def paren(paren):
+            return r.then("(", r.maybe(paren), ")")
+        self.match(r.letrec(paren), "((()))", 6)
+        self.assertEqual(4, r.profileStats()["paren"]["calls"])
+        self.assertEqual(1, r.profileStats()["paren"]["failures"])
+        class Item:
+            def __call__(self, paren, item, bracket):
+                return r.choice(paren, r.re("[a-z]"))
+        grammar = r.letrec(functools.partial(lambda open, paren, item, bracket: r.then(open, r.zeroOrMore(item), ")"), "("),
+            Item(), lambda paren, item, bracket: r.then("[", paren, "]"))
+        self.match(grammar, "(a(b))", 6)
+        stats = r.profileStats()
+        self.assertEqual((2, 5, 0), (stats["rule0"]["calls"], stats["rule1"]["calls"], stats["rule2"]["calls"]))
+
+    def test_incremental(self):
+        r = rena.Rena({ "ignore": rena.Rena().re("[ ]+") })
+        def stmts(stmts, expr):
+            return r.zeroOrMore(r.then(r.re("[a-z]+"), "=", expr, ";"))
+        def expr(stmts, expr):
+            return r.delimit(r.choice(r.re("[0-9]+"), r.then("(", expr, ")")), "+")
+        grammar = r.letrec(stmts, expr)
+        parser = r.incremental(grammar)
+        text = "a = 1 + (2 + 3); b = 4; c = (5 + 6) + 7;"
+        self.assertEqual(grammar(text, 0, 0), parser.parse(text, 0))
+        for offset, deleted, inserted in [(5, 0, "1"), (17, 1, "bb"), (0, 0, "x = 0; "), (25, 3, ""), (10, 0, "(")]:
+            result = parser.edit(offset, deleted, inserted)
+            text = text[:offset] + inserted + text[offset + deleted:]
+            self.assertEqual(text, parser.text)
+            self.assertEqual(grammar(text, 0, 0), result)
+        hits = parser.counter["hits"]
+        parser.edit(len(text), 0, " ")
+        self.assertTrue(parser.counter["hits"] > hits)
+        for pattern in [r"\bfoo", "(?<= )foo", "^foo"]:
+            behind = r.then(r.re("[a-z ]*?(?=foo)"), r.memo(r.re(pattern)))
+            parser = r.incremental(behind)
+            parser.parse("x foo", 0)
+            self.assertEqual(behind("xyfoo", 0, 0), parser.edit(1, 1, "y"))
+            self.assertEqual(behind("xy  foo", 0, 0), parser.edit(2, 0, "  "))
+
+    def test_incremental_long(self):
+        r = rena.Rena({ "ignore": rena.Rena().re("[ ]+") })
+        def stmts(stmts, expr):
+            return r.zeroOrMore(r.then(r.re("[a-z]+"), "=", expr, ";"))
+        def expr(stmts, expr):
+            return r.delimit(r.choice(r.re("[0-9]+"), r.then("(", expr, ")")), "+")
+        grammar = r.letrec(stmts, expr)
+        parser = r.incremental(grammar)
+        text = "".join("v = %d + (%d + 1); " % (index, index) for index in range(300))
+        parser.parse(text, 0)
+        for offset, deleted, inserted in [(2000, 1, "7"), (100, 0, "x = 1; "), (3000, 2500, ""), (4, 0, "(2)+")]:
+            stored = parser.entries.sequence
+            result = parser.edit(offset, deleted, inserted)
+            text = text[:offset] + inserted + text[offset + deleted:]
+            self.assertEqual(grammar(text, 0, 0), result)
+            self.assertTrue(parser.entries.sequence - stored < 100)
+
+    def test_incremental_spans(self):
+        r = rena.Rena({ "spans": True })
+        item = r.memo(r.then(r.re("[a-z]+"), ","))
+        parser = r.incremental(r.then(r.zeroOrMore(r.action(item, lambda m, s, i: i + 1 if m[-1] == "," else None)), r.end()))
+        parser.parse("ab,cd,ef,", 0)
+        self.assertEqual(((0, 10), 10, 3), parser.edit(1, 0, "x"))
+        self.assertEqual(((0, 9), 9, 3), parser.edit(5, 1, ""))
+        self.assertEqual({ "hits": 6, "misses": 6 }, parser.counter)
+
+    def test_push(self):
+        r = rena.Rena()
+        def item(item):
+            return r.choice(r.then("(", r.attr(0), r.zeroOrMore(r.action(item, lambda m, s, i: i + s)), ")"),
+                r.action(r.re("[0-9]+"), lambda m, s, i: int(m)))
+        message = r.then(r.letrec(item), ";")
+        parser = r.pushParser(message)
+        self.assertEqual([], parser.feed("(1(2"))
+        self.assertEqual([], parser.feed("3)"))
+        self.assertEqual([28, 4], parser.feed("4);4;"))
+        self.assertTrue(parser.incremental.counter["hits"] > 0)
+        self.assertEqual([], parser.feed("12"))
+        self.assertEqual([123], parser.feed("3;"))
+        self.assertEqual([], parser.feed("(5"))
+        with self.assertRaises(rena.ParseError) as error:
+            parser.close()
+        self.assertEqual(15, error.exception.index)
+        text = "(" + "((1)(23)(456))" * 200 + ");"
+        parser = r.pushParser(message)
+        self.assertEqual([96000], parser.feed(text))
+        misses = parser.incremental.counter["misses"]
+        parser = r.pushParser(message)
+        self.assertEqual([96000], sum([parser.feed(text[i:i + 7]) for i in range(0, len(text), 7)], []))
+        self.assertTrue(parser.incremental.counter["misses"] < misses * 2)
+
+    def test_push_complete(self):
+        r = rena.Rena()
+        message = r.then("GET ", r.action(r.re("[a-z]+"), lambda m, s, i: m), r.br())
+        parser = r.pushParser(message, attr=None)
+        self.assertEqual([], parser.feed("GET a"))
+        self.assertEqual(["a", "b"], parser.feed("\r\nGET b\r\n"))
+        self.assertEqual(["c"], parser.feed("GET c\n"))
+        self.assertEqual([], parser.feed("GET d\r"))
+        self.assertEqual(["d"], parser.feed("\n"))
+        parser = r.pushParser(r.then(r.action(r.re("[a-z]+"), lambda m, s, i: m), r.re(";")), attr=None)
+        self.assertEqual(["ab"], parser.feed("ab;"))
+        parser = r.pushParser(r.then(r.action(r.re("a$"), lambda m, s, i: m)), attr=None)
+        self.assertEqual([], parser.feed("a"))
+        self.assertEqual(["a"], parser.close())
+
+    def test_aiterparse(self):
+        r = rena.Rena({ "bytes": True })
+        line = r.then(r.action(r.re("[a-z]+"), lambda m, s, i: bytes(m)), r.br())
+        async def parse():
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"ab\r")
+            reader.feed_data(b"\ncd\n")
+            reader.feed_eof()
+            return [result async for result in r.aiterparse(line, reader, 2)]
+        self.assertEqual([b"ab", b"cd"], asyncio.run(parse()))
+
+    def test_iterparse(self):
+        r = rena.Rena()
+        record = r.then(r.attr([]), r.delimit(r.action(r.real(), lambda m, s, i: i + [s]), ","), r.br())
+        for chunkSize in (1, 2, 3, 65536):
+            result = list(r.iterparse(record, io.StringIO("1,2,3\n4.5,6e2\n7\n"), chunkSize))
+            self.assertEqual([[1.0, 2.0, 3.0], [4.5, 600.0], [7.0]], result)
+        self.assertEqual([[1.0, 2.0], [3.0]], list(r.iterparse(record, ["1,2", "\n3", "", "\n"])))
+        with self.assertRaises(rena.ParseError) as error:
+            list(r.iterparse(record, io.StringIO("1,2\nx\n"), 2))
+        self.assertEqual(4, error.exception.index)
+
+    def test_iterparse_keys(self):
+        r = rena.Rena({ "ignore": rena.Rena().re("[ \t]+"), "keys": ["+", "++"], "memo": True })
+        def record(record):
+            token = r.choice(r.equalsId("ab"), r.key("++"), r.key("+"), r.re("[a-z]+"))
+            return r.then(r.attr(0), r.oneOrMore(r.action(token, lambda m, s, i: i + 1)), r.br())
+        record = r.letrec(record)
+        for chunkSize in (1, 2, 5):
+            self.assertEqual([4, 2, 1], list(r.iterparse(record, io.StringIO("ab ++ + abc\nab++\nabc\n"), chunkSize)))
+
+    def test_parallel(self):
+        r = rena.Rena()
+        text = "".join(str(i) + ",1\n" for i in range(100))
+        self.assertEqual(5050.0, r.parallel(sumLines, text, operator.add, workers=1))
+        self.assertEqual(5050.0, r.parallel(sumLines, text, operator.add, workers=3, chunkSize=10))
+        self.assertEqual(3.0, r.parallel(sumLines, "1\n2", operator.add, workers=3, chunkSize=1))
+        with self.assertRaises(rena.ParseError) as error:
+            r.parallel(sumLines, text[:12] + "x" + text[12:], operator.add, workers=3, chunkSize=10)
+        self.assertEqual(12, error.exception.index)
+
+    def test_cached(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for stackless in (False, True):
+                expr = rena.cached(scaledSum, directory, stackless=stackless)
+                self.assertEqual(("(1 (2 3) 4)", 11, 20.0), expr("(1 (2 3) 4)", 0, 0))
+                self.assertEqual(("(1 (2 3) 4)", 11, 20.0), rena.cached(scaledSum, directory, stackless=stackless)("(1 (2 3) 4)", 0, 0))
+            self.assertEqual(2, len(os.listdir(directory)))
+            rena.cached(scaledSum, directory, key="other")
+            self.assertEqual(3, len(os.listdir(directory)))
+            global sumScale, scaledNumber
+            number = scaledNumber
+            try:
+                sumScale = 3
+                self.assertEqual(30.0, rena.cached(scaledSum, directory)("(1 (2 3) 4)", 0, 0)[2])
+                scaledNumber = lambda r: r.real()
+                self.assertEqual(10.0, rena.cached(scaledSum, directory)("(1 (2 3) 4)", 0, 0)[2])
+            finally:
+                sumScale = 2
+                scaledNumber = number
+            self.assertEqual(5, len(os.listdir(directory)))
+            r, exp = scaledSum()
+            path = os.path.join(directory, "sum.rena")
+            self.assertEqual(("5", 1, 10.0), r.save(exp, path)("5", 0, 0))
+            self.assertEqual((None, None, None), rena.load(path)("(5", 0, 0))
+            text = "(" + " 987654321" * 10000 + ")"
+            self.assertEqual(len(text), exp(text, 0, 0)[1])
+            r.save(exp, path)
+            with open(path, "rb") as f:
+                data = f.read()
+            self.assertNotIn(b"987654321", data)
+            self.assertTrue(len(data) < 20000)
+            self.assertEqual(len(text), rena.load(path)(text, 0, 0)[1])
+            with open(path, "wb") as f:
+                f.write(b"broken")
+            with self.assertRaises(ValueError):
+                rena.load(path)
+
 if __name__ == "__main__":
     unittest.main()
 